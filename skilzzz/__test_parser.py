@@ -8,13 +8,19 @@ ipython -i skilzzz/__test_parser.py -- \
 
     
 For Testing Parser
+
+python skilzzz/__test_parser.py --storage s3 --compare v1 v2
+
+Parses --html, or every page of test_htmls, with both versions and logs
+fields that differ. Exits with 1 when any page differs.
 """
 
 import argparse
 import json
+import sys
 from bs4 import BeautifulSoup
 from scraper.producer.storage import StorageProducer
-from scraper.parsers.justjoinit import parsers
+from scraper.parsers.justjoinit import html_parsers, parsers
 from scraper.logger import logger
 
 import tempfile
@@ -33,13 +39,21 @@ def init_script():
     global soup
     
     parser = argparse.ArgumentParser()
-    parser.add_argument('--html', type=str, required=True)
+    parser.add_argument('--html', type=str)
     parser.add_argument('--storage', type=str, required=True)
     parser.add_argument('--open-browser', action='store_true')
     parser.add_argument('--test', action='store_true')
+    parser.add_argument('--cache', action='store_true')
+    parser.add_argument('--compare', nargs=2, choices=list(parsers), metavar='VERSION')
     args = parser.parse_args()
 
-    producer = StorageProducer(storage=args.storage)
+    producer = StorageProducer(storage=args.storage, cache=args.cache)
+    if args.compare:
+        htmls = [args.html] if args.html else test_htmls
+        sys.exit(0 if compare_parsers(producer, htmls, *args.compare) else 1)
+    if not args.html:
+        parser.error("--html is required unless --compare is given")
+
     content = producer.get(args.html)
     soup = BeautifulSoup(content, 'lxml')
 
@@ -54,6 +68,35 @@ def init_script():
         logger.error(str(e))
 
 
+def parse_with(version: str, content: str):
+    """Parsed offer or None, as offers failed to parse are skipped by parser job."""
+    document = content if version in html_parsers else BeautifulSoup(content, 'lxml')
+    try:
+        return parsers[version](document)
+    except Exception as e:
+        logger.warning(f"{version} failed to parse. {e!r}")
+        return None
+
+
+def compare_parsers(producer, htmls, version, other) -> bool:
+    same = True
+    for html in htmls:
+        content = producer.get(html)
+        result, other_result = parse_with(version, content), parse_with(other, content)
+        if result == other_result:
+            logger.info(f"{html}: {version} and {other} are equal")
+            continue
+
+        same = False
+        if result is None or other_result is None:
+            logger.error(f"{html}: parsed only by {other if result is None else version}")
+            continue
+        for field in sorted(set(result) | set(other_result)):
+            if result.get(field) != other_result.get(field):
+                logger.error(f"{html}: {field} differs\n{version}: {result.get(field)!r}\n{other}: {other_result.get(field)!r}")
+    return same
+
+
 def open_soup(content: str):
     with tempfile.NamedTemporaryFile(delete=False, suffix='.html', mode='w') as temp_file:
         temp_file.write(content)
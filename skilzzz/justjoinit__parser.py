@@ -1,18 +1,25 @@
 import json
+import multiprocessing
 import click
 
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Generator, List
+from itertools import islice
+from typing import Generator, List, Optional, Tuple
 from scraper.producer.storage import StorageProducer
-from scraper.output import Output, DictOutput
+from scraper.output import Output, DictOutput, ParquetOutput, arrow_schema
+from scraper.partitioner import YMDTSPartitioner
 from scraper.session import Session, SessionMetadata
 from scraper.settings import TIMESTAMP_FORMAT
 from scraper.stepfunctions import stepfunctions_callback_handler
-from scraper.storer import AppendStorer
+from scraper.storer import MultiFormatStorer, ParquetStorer, WriterThreadStorer
 from scraper.logger import logger
+from scraper.parsers.cache import ParseCache
 from scraper.parsers.exceptions import InvalidHTMLDocument
-from scraper.parsers.justjoinit import parsers
+from scraper.parsers.justjoinit import html_parsers, parsers, schema_parsers
+from scraper.parsers.justjoinit.validation import validate_offers
+from scraper.parsers.justjoinit.justjoinit__offers_v1 import JobOffer
 
 from bs4 import BeautifulSoup
 import re
@@ -21,7 +28,7 @@ import traceback
 
 
 
-class JustjoinitStorer(AppendStorer):
+class JustjoinitStorer(MultiFormatStorer):
     """
     In this case we dont want to close file after ending session
     because item will be yielded by child session. Files will be 
@@ -30,14 +37,159 @@ class JustjoinitStorer(AppendStorer):
     def on_session_end(self):
         pass
 
+    def end(self):
+        """End storers of main session, closing files and stopping writer."""
+        super().on_session_end()
+
+
+PARSER_VERSION = "v1"
 
 @dataclass(frozen=True)
 class JustjoinitOffersFanoutSettings:
-    pattern: str
+    pattern: Optional[str] = None
+    parquet_schema: Optional["pa.Schema"] = None
+    # Session folders, files are read from their manifests instead of globbing.
+    manifests: Tuple[str, ...] = ()
+    # Parse in that many worker processes, 0 parses in session threads.
+    processes: int = 0
+    chunk_size: int = 16
+    parser: str = PARSER_VERSION
+    parse_cache: Optional[ParseCache] = None
 
 @dataclass(frozen=True)
 class JustjoinitOfferParserSettings:
     file: str
+    parser: str = PARSER_VERSION
+    parquet_schema: Optional["pa.Schema"] = None
+    # Prefetched by fanout, loaded with producer if not given.
+    content: Optional[bytes] = None
+    # Already parsed by worker process, offer is None if parsing failed.
+    parsed: bool = False
+    offer: Optional[dict] = None
+    parse_cache: Optional[ParseCache] = None
+    # Still listed record, file is page stored by earlier session and offer is stamped as listed by this one.
+    listing: Optional[dict] = None
+
+
+def parse_file_key(file: str) -> Tuple[str, str, str]:
+    """Session ts, offer index and offer id of scraped offer file."""
+    if not (match := re.findall("ts=([0-9]{14})/([0-9]{5})-(.*).html", file)):
+        raise ValueError("Cannot parse ts from filepath corrently")
+    return match[0]
+
+
+def still_listed_pattern(name: str, session_ts: str) -> str:
+    """Pattern of still listed records of listing session, stored with any compression."""
+    partition = YMDTSPartitioner(dt=datetime.strptime(session_ts, TIMESTAMP_FORMAT)).get()
+    return f"sources/{name}/offerlist/jsonl/{partition}/{name}-still-listed-{session_ts}.jsonl*"
+
+
+def is_offer_file(file: str) -> bool:
+    try:
+        parse_file_key(file)
+        return True
+    except ValueError:
+        return False
+
+
+OFFER_METADATA = ("listed_at", "offer_index", "offer_id")
+
+
+def parse_offer_file(file: str, content: bytes, version: str) -> Optional[dict]:
+    """
+    Parse offer html into offer record. Errors are logged and None is returned.
+    Records of schema parsers are not validated, see `validate_records`.
+    """
+    try:
+        session_ts, offer_index, offer_id = parse_file_key(file)
+        file_content = content.decode('utf-8')
+        if version in html_parsers:
+            document = file_content
+        else:
+            document = BeautifulSoup(file_content, "lxml")
+
+        if version in schema_parsers:
+            parsed_offer = parsers[version](document, validate=False)
+        else:
+            parsed_offer = parsers[version](document)
+        return {
+            "listed_at": session_ts, 
+            "offer_index": offer_index,
+            "offer_id": offer_id,
+            **parsed_offer
+        }
+    except InvalidHTMLDocument as e:
+        logger.error(f"Cannot parse file {file} due to recognized invalid html. {e}")
+    except Exception as e:
+        traceback_str = "".join(traceback.format_tb(e.__traceback__))
+        logger.critical(f"Cannot parse file {file}. Unhandled exception:\n{e}\n{traceback_str}")
+    return None
+
+
+def validate_records(files: List[str], records: List[Optional[dict]], version: str) -> List[Optional[dict]]:
+    """Validate parsed records at once, invalid ones are logged as error records and dropped."""
+    if version not in schema_parsers:
+        return records
+
+    parsed = [(file, record) for file, record in zip(files, records) if record is not None]
+    offers, errors = validate_offers([
+        {key: value for key, value in record.items() if key not in OFFER_METADATA}
+        for _, record in parsed
+    ])
+    for error in errors:
+        error_record = {"file": parsed[error["index"]][0], "errors": error["errors"]}
+        logger.error(f"Invalid offer: {json.dumps(error_record)}")
+
+    validated = iter(
+        None if offer is None else {**{key: record[key] for key in OFFER_METADATA}, **offer}
+        for (_, record), offer in zip(parsed, offers)
+    )
+    return [None if record is None else next(validated) for record in records]
+
+
+def parse_files(chunk: List[Tuple[str, bytes]], version: str, cache: Optional[ParseCache] = None) -> List[Optional[dict]]:
+    """
+    Parse and validate offer files. Offers of html already parsed by the same
+    parser are taken from cache, without building document and validating.
+    """
+    keys = [cache.key(content) if cache else None for _, content in chunk]
+    records, parsed = [], []
+    for index, ((file, content), key) in enumerate(zip(chunk, keys)):
+        if cache and (offer := cache.get(key)) is not None:
+            try:
+                metadata = dict(zip(OFFER_METADATA, parse_file_key(file)))
+                records.append({**metadata, **offer})
+                continue
+            except ValueError:
+                pass
+        records.append(parse_offer_file(file, content, version))
+        parsed.append(index)
+
+    files = [chunk[index][0] for index in parsed]
+    validated = validate_records(files, [records[index] for index in parsed], version)
+    for index, record in zip(parsed, validated):
+        records[index] = record
+        if cache and record is not None:
+            cache.put(keys[index], {key: value for key, value in record.items() if key not in OFFER_METADATA})
+    return records
+
+
+# Parser version and parse cache of worker process, set once per process.
+worker_version = None
+worker_cache = None
+
+def init_worker(version: str, cache_storage: Optional[str]):
+    global worker_version, worker_cache
+    if version not in parsers:
+        raise ValueError(f"Unknown parser version {version}.")
+    worker_version = version
+    if cache_storage:
+        worker_cache = ParseCache(cache_storage, name="justjoinit", version=version, parser=parsers[version])
+
+def parse_chunk(chunk: List[Tuple[str, bytes]]) -> List[Tuple[str, Optional[dict]]]:
+    files = [file for file, _ in chunk]
+    return list(zip(files, parse_files(chunk, worker_version, worker_cache)))
+
 
 class JustjoinitOffersFanout(Session):
     """
@@ -46,83 +198,232 @@ class JustjoinitOffersFanout(Session):
     """
 
     def process(self) -> Generator[Output, None, None]:
-        files = self.producer.glob(pattern=self.settings.pattern)
+        if self.settings.manifests:
+            files = [
+                asset["key"]
+                for folder in self.settings.manifests
+                for asset in self.producer.manifest(folder)
+                if is_offer_file(asset["key"])
+            ]
+        else:
+            files = self.producer.glob(pattern=self.settings.pattern)
+        if not files:
+            logger.info(f"No files is given pattern {self.settings.pattern} or manifests {self.settings.manifests}")
+
+        # Sessions completed in resumed journal are skipped, no need to download their files.
+        completed = {file for file in files if self.journal and self.journal.is_completed(file)}
+        pending = [file for file in files if file not in completed]
         for file in files:
-            logger.info(f"Created parsing session for file {file}")
-            yield JustjoinintOfferParser(
-                name=self.name,
-                collection=self.collection,
-                producer=self.producer,
-                storer=self.storer,
-                settings=JustjoinitOfferParserSettings(
-                    file=file
-                )
-            )
+            if file in completed:
+                yield self.create_parser(file)
+
+        # Files failed to prefetch have no content, their sessions download them again.
+        prefetched = self.producer.get_many(pending)
+        if self.settings.processes:
+            failed = []
+
+            def downloaded():
+                for file, content in prefetched:
+                    if content is None:
+                        failed.append(file)
+                        continue
+                    yield file, content
+
+            # Parsed in worker processes, child sessions only store parsed offers.
+            for file, offer in self.parse_in_processes(downloaded()):
+                yield self.create_parser(file, parsed=True, offer=offer)
+            for file in failed:
+                yield self.create_parser(file)
         else:
-            logger.info(f"No files is given pattern {self.settings.pattern}")
+            for file, content in prefetched:
+                yield self.create_parser(file, content=content)
+
+        # Offers unchanged since earlier session were not scraped again, parse their stored pages.
+        for listing in self.still_listed(files):
+            yield self.create_parser(listing["key"], listing=listing)
+
+    def still_listed(self, files: List[str]) -> Generator[dict, None, None]:
+        """Still listed records of listing sessions whose offer files or folders are parsed."""
+        sessions = {parse_file_key(file)[0] for file in files if is_offer_file(file)}
+        sessions.update(ts for folder in self.settings.manifests for ts in re.findall("ts=([0-9]{14})", folder))
+        for session_ts in sorted(sessions):
+            for file in self.producer.glob(pattern=still_listed_pattern(self.name, session_ts)):
+                try:
+                    content = self.producer.get(file)
+                except Exception as e:
+                    logger.error(f"Cannot load still listed offers {file}. {e}")
+                    continue
+                listings = [json.loads(line) for line in content.splitlines() if line]
+                logger.info(f"Loaded {len(listings)} still listed offers from {file}")
+                yield from listings
+
+    def create_parser(self, file: str, **settings) -> "JustjoinintOfferParser":
+        logger.info(f"Created parsing session for file {file}")
+        return JustjoinintOfferParser(
+            name=self.name,
+            collection=self.collection,
+            producer=self.producer,
+            storer=self.storer,
+            settings=JustjoinitOfferParserSettings(
+                file=file,
+                parquet_schema=self.settings.parquet_schema,
+                parser=self.settings.parser,
+                parse_cache=self.settings.parse_cache,
+                **settings,
+            )
+        )
+
+    def parse_in_processes(self, prefetched) -> Generator[Tuple[str, Optional[dict]], None, None]:
+        """Parse files in chunks on process pool, at most two chunks per worker are in flight."""
+        with ProcessPoolExecutor(
+            max_workers=self.settings.processes,
+            # Forked workers would inherit locks held by threads of this process, e.g. prefetch or writer.
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=init_worker,
+            initargs=(
+                self.settings.parser,
+                self.settings.parse_cache.storage_type if self.settings.parse_cache else None,
+            ),
+        ) as executor:
+            in_flight = set()
+            while (chunk := list(islice(prefetched, self.settings.chunk_size))):
+                in_flight.add(executor.submit(parse_chunk, chunk))
+                if len(in_flight) >= 2 * self.settings.processes:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+
+            for future in as_completed(in_flight):
+                yield from future.result()
+
+    def start(self):
+        try:
+            return super().start()
+        except Exception:
+            # Writer of failed session is stopped too, its errors are only logged.
+            try:
+                self.storer.end()
+            except Exception as e:
+                logger.error(f"Cannot end storer of failed session. {e}")
+            raise
 
     def after_process(self):
-        # Mannualy closed all opened files after.
-        opened = [file for file, _ in self.storer.storage.opened.items()]
-        for file in opened:
-            self.storer.storage.close(file)
+        # Mannualy closed all opened files and stopped writer after, its errors fail the session.
+        self.storer.end()
 
 class JustjoinintOfferParser(Session):
+
+    def checkpoint_id(self):
+        # Page of still listed offer may be parsed also as listed by its own session.
+        if self.settings.listing:
+            return f"{self.settings.listing['listed_at']}:{self.settings.file}"
+        return self.settings.file
                 
     def process(self) -> Generator[Output, None, None]:
-        try:
-            # Getting ts from files session.
-            if not (match := re.findall("ts=([0-9]{14})/([0-9]{5})-(.*).html", self.settings.file)):
-                raise ValueError("Cannot parse ts from filepath corrently")
-
-            # Act as continuation of file processing session
-            session_ts, offer_index, offer_id = match[0]
-            session_dt = datetime.strptime(session_ts, TIMESTAMP_FORMAT)
-            self.metadata = SessionMetadata(
-                session_dt = session_dt,
-                session_ts = session_ts
-            ) 
-            
-            # Load html from filesystem
-            file_content = self.producer.get(self.settings.file)
+        # Act as continuation of file processing session
+        listing = self.settings.listing
+        if listing:
+            session_ts = listing["listed_at"]
+        else:
+            try:
+                session_ts, _, _ = parse_file_key(self.settings.file)
+            except ValueError as e:
+                logger.critical(f"Cannot parse file {self.settings.file}. {e}")
+                return
+
+        session_dt = datetime.strptime(session_ts, TIMESTAMP_FORMAT)
+        self.metadata = SessionMetadata(
+            session_dt = session_dt,
+            session_ts = session_ts
+        ) 
+
+        if self.settings.parsed:
+            offer = self.settings.offer
+        else:
+            # Load html from filesystem, unless already prefetched
+            if self.settings.content is not None:
+                file_content = self.settings.content
+            else:
+                try:
+                    file_content = self.producer.get_bytes(self.settings.file)
+                except Exception as e:
+                    logger.error(f"Cannot load file {self.settings.file}. {e}")
+                    return
             logger.info(f"Loaded {self.settings.file} from {self.producer.__class__.__name__}")
+            offer, = parse_files([(self.settings.file, file_content)], self.settings.parser, self.settings.parse_cache)
+
+        if offer is None:
+            return
 
-            soup = BeautifulSoup(file_content, "lxml")
-
-            parser_func = parsers['v1']
-            
-            parsed_offer = parser_func(soup)
-            yield DictOutput(
-                key=f"justjoinit-offers-{session_ts}.jsonl",
-                content={
-                    "listed_at": session_ts, 
-                    "offer_index": offer_index,
-                    "offer_id": offer_id,
-                    **parsed_offer
-                }
+        if listing:
+            offer = {
+                **offer,
+                "listed_at": listing["listed_at"],
+                "offer_index": f"{listing['offer_index']:05}",
+                "offer_id": listing["offer_id"],
+            }
+
+        yield DictOutput(
+            key=f"justjoinit-offers-{session_ts}.jsonl",
+            content=offer
+        )
+
+        if self.settings.parquet_schema:
+            yield ParquetOutput(
+                key=f"justjoinit-offers-{session_ts}.parquet",
+                content=offer,
+                schema=self.settings.parquet_schema,
             )
-        except InvalidHTMLDocument as e:
-            logger.error(f"Cannot parse file {self.settings.file} due to recognized invalid html. {e}")
-        except Exception as e:
-            traceback_str = "".join(traceback.format_tb(e.__traceback__))
-            logger.critical(f"Cannot parse file {self.settings.file}. Unhandled exception:\n{e}\n{traceback_str}")
                     
         
 @click.command()
 @click.option("--pattern")
+@click.option("--manifest", "manifests", multiple=True, help="Session folder to parse files listed in its manifest, instead of --pattern.")
 @click.option("--read", default='s3')
 @click.option("--write", default='s3')
+@click.option("--cache", is_flag=True, default=False, help="Keep html read from s3 in local disk cache for reruns.")
+@click.option("--revalidate-cache", is_flag=True, default=False, help="Check ETag of html cached by --cache with s3 before using it.")
+@click.option("--processes", default=0, type=int, help="Parse in that many worker processes instead of session threads.")
+@click.option("--chunk-size", default=16, type=int, help="Files sent to worker process at once.")
+@click.option("--parser", "parser_version", default=PARSER_VERSION, type=click.Choice(list(parsers)), help="Version of offer parser.")
+@click.option("--parse-cache", is_flag=True, default=False, help="Reuse results of html already parsed by the same parser.")
+@click.option("--parquet", is_flag=True, default=False, help="Store parsed offers also as parquet files.")
+@click.option("--journal", is_flag=True, default=False, help="Record parsed files, so interrupted session can be resumed.")
+@click.option("--resume", default=None, type=str, help="Timestamp of interrupted parsing session to continue.")
 @stepfunctions_callback_handler
-def main(pattern, read, write):
-    assets = JustjoinitOffersFanout(
+def main(pattern, manifests, read, write, cache, revalidate_cache, processes, chunk_size, parser_version, parse_cache, parquet, journal, resume):
+    # Journaled outputs are split in parts, so resumed session does not overwrite them.
+    storers = {"jsonl": WriterThreadStorer(storage=write, split_parts=bool(journal or resume))}
+    parquet_schema = None
+    if parquet:
+        storers["parquet"] = ParquetStorer(storage=write, split_parts=bool(journal or resume))
+        parquet_schema = arrow_schema(JobOffer, prefix={"listed_at": str, "offer_index": str, "offer_id": str})
+
+    if parse_cache:
+        parse_cache = ParseCache(write, name="justjoinit", version=parser_version, parser=parsers[parser_version])
+    else:
+        parse_cache = None
+
+    session = JustjoinitOffersFanout(
         name="justjoinit",
         collection="offers",
-        producer=StorageProducer(storage=read),
-        storer=JustjoinitStorer(storage=write),
+        producer=StorageProducer(storage=read, cache=cache, revalidate=revalidate_cache),
+        storer=JustjoinitStorer(storers=storers),
         settings=JustjoinitOffersFanoutSettings(
-            pattern=pattern
+            pattern=pattern,
+            parquet_schema=parquet_schema,
+            manifests=tuple(manifests),
+            processes=processes,
+            chunk_size=chunk_size,
+            parser=parser_version,
+            parse_cache=parse_cache,
         )
-    ).start()
+    )
+    if resume:
+        session.resume(resume)
+    elif journal:
+        session.enable_journal()
+    assets = session.start()
 
     logger.info("Session output:\n" + json.dumps(assets, indent=4))
     return assets
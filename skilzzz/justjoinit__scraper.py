@@ -8,14 +8,22 @@ from urllib.parse import urljoin
 
 import click
 
+from scraper.index import OfferIndex, fingerprint
 from scraper.logger import logger
-from scraper.output import HTMLOutput, Output
-from scraper.session import Session
+from scraper.output import HTMLOutput, JSONLinesOutput, Output
+from scraper.session import Session, SessionScheduler
 from scraper.storer import OverwriteStorer
-from scraper.producer.html.selenium import SeleniumProducer
+from scraper.producer.html.selenium import (
+    DOMQuiet,
+    NetworkIdle,
+    NewElementsAppeared,
+    SeleniumProducer,
+    WaitCondition,
+    WebDriverPool,
+)
 from scraper.stepfunctions import stepfunctions_callback_handler
 
-from scraper.settings import SELENIUM_ADDRESS
+from scraper.settings import SELENIUM_ADDRESS, SELENIUM_DRIVER_MAX_PAGES, SELENIUM_POOL_SIZE
 
 
 @dataclass(frozen=True)
@@ -24,6 +32,12 @@ class JustjoinitOffersScraperSettings:
     init_wait: int
     scroll_wait: int
     scroll_by: int
+    driver_pool: WebDriverPool
+    known_offers: OfferIndex
+    skip_known: bool
+    incremental: bool
+    wait_until: WaitCondition
+    raw_html: bool
 
 
 class JustjoinitOffersScraper(Session):
@@ -38,18 +52,28 @@ class JustjoinitOffersScraper(Session):
         init_wait = self.settings.init_wait
         scroll_wait = self.settings.scroll_wait
         scroll_by = self.settings.scroll_by
+        wait_until = self.settings.wait_until
         producer = self.producer
 
-        followed_links = []
-        for i, response in enumerate(
-            producer.get_while_scrolling(
-                url, wait_time=init_wait, scroll_wait=scroll_wait, scroll_by=scroll_by
+        # Incremental responses contain only offers that appeared since
+        # previous response instead of whole page snapshot.
+        if self.settings.incremental:
+            responses = producer.get_new_while_scrolling(
+                url, wait_time=init_wait, scroll_wait=scroll_wait, scroll_by=scroll_by, wait_until=wait_until
             )
-        ):
+        else:
+            responses = producer.get_while_scrolling(
+                url, wait_time=init_wait, scroll_wait=scroll_wait, scroll_by=scroll_by, wait_until=wait_until
+            )
+
+        followed_links = set()
+        still_listed = []
+        for i, response in enumerate(responses):
             # Save each response
             yield HTMLOutput(
                 key=f"justjoinit-listings-{self.metadata.session_ts}-{i:05}.html",
-                content=response
+                content=response,
+                raw=self.settings.raw_html,
             )
 
             # parse every offer from response
@@ -60,6 +84,29 @@ class JustjoinitOffersScraper(Session):
 
                 follow_link = urljoin("https://justjoin.it/", offer_link)
                 if follow_link not in followed_links:
+                    offer_id = follow_link.split("/")[-1]
+                    offer_fingerprint = fingerprint(offer.get_text(" "))
+
+                    # Offer known from previous sessions and its card did not change.
+                    if self.settings.skip_known and self.settings.known_offers.is_unchanged(
+                        offer_id, offer_fingerprint, self.metadata.session_dt
+                    ):
+                        logger.info(f"Offer {offer_id} unchanged since last scrape. Recording as still listed.")
+                        # Key of last stored page lets consumers parse it as offer listed in this session.
+                        entry = self.settings.known_offers.get(offer_id)
+                        still_listed.append({
+                            "offer_id": offer_id,
+                            "offer_index": offer_index,
+                            "listed_at": self.metadata.session_ts,
+                            "key": entry["key"],
+                            "last_scraped": entry["last_scraped"],
+                            "first_seen": entry["first_seen"],
+                            "last_seen": entry.get("last_seen"),
+                        })
+                        self.settings.known_offers.listed(offer_id, offer_fingerprint, self.metadata.session_ts)
+                        followed_links.add(follow_link)
+                        continue
+
                     logger.info(
                         f"Rendered page: {i}, offer data-index {offer_index}: {follow_link}"
                     )
@@ -68,22 +115,39 @@ class JustjoinitOffersScraper(Session):
                     yield JustjoinitOfferPageScraper(
                         name='justjoinit',
                         collection='offers',
-                        producer=SeleniumProducer(address=SELENIUM_ADDRESS),
-                        storer=OverwriteStorer(storage=self.storer.storage_type),
+                        producer=SeleniumProducer(pool=self.settings.driver_pool),
+                        storer=OverwriteStorer(storage=self.storer.storage_type, compression=self.storer.compression),
                         settings=JustjoinitOfferPageScraperSettings(
                             url=follow_link,
                             offer_index=offer_index,
+                            fingerprint=offer_fingerprint,
+                            known_offers=self.settings.known_offers,
+                            raw_html=self.settings.raw_html,
                         ),
                     )
 
                 # Remember followed links to prevent from scraping duplicates.
-                followed_links.append(follow_link)
+                followed_links.add(follow_link)
+
+        if still_listed:
+            yield JSONLinesOutput(
+                key=f"justjoinit-still-listed-{self.metadata.session_ts}.jsonl",
+                content=still_listed,
+                metadata={"still_listed": len(still_listed)},
+            )
+
+    def after_process(self):
+        # Children are done, persist what was seen in this session.
+        self.settings.known_offers.save()
 
 
 @dataclass(frozen=True)
 class JustjoinitOfferPageScraperSettings:
     url: str 
     offer_index: int
+    fingerprint: str
+    known_offers: OfferIndex
+    raw_html: bool
 
 class JustjoinitOfferPageScraper(Session):
     def process(self) -> Generator[Output, None, None]:
@@ -94,29 +158,78 @@ class JustjoinitOfferPageScraper(Session):
             yield HTMLOutput(
                 key=f"{self.settings.offer_index:05}-{offer_id}.html",
                 content=response,
+                raw=self.settings.raw_html,
+                metadata={"offer_id": offer_id, "offer_index": self.settings.offer_index},
             )
 
+    def checkpoint_id(self):
+        return self.settings.url
+
+    def after_store(self, output: Output, asset_path: str):
+        # Index only offers with stored page, journaled sessions store outputs on completion.
+        offer_id = self.settings.url.split("/")[-1]
+        self.settings.known_offers.scraped(offer_id, self.settings.fingerprint, self.metadata.session_ts, key=asset_path)
+
+wait_conditions = {
+    "sleep": lambda: None,
+    "new-elements": NewElementsAppeared,
+    "dom-quiet": DOMQuiet,
+    "network-idle": NetworkIdle,
+}
+
 @click.command()
 @click.option("--storage", default="s3", type=str, help="Target storage of scraping task. One of {'fs', 's3'}")
 @click.option("--init-wait", default=3, type=int, help="Seconds await until page loads")
-@click.option("--scroll-wait", default=1, type=int, help="Seconds wait after scrolling down")
+@click.option("--scroll-wait", default=1, type=int, help="Seconds wait after scrolling down, maximum wait if --wait-until is set")
+@click.option(
+    "--wait-until",
+    default="sleep",
+    type=click.Choice(["sleep", "new-elements", "dom-quiet", "network-idle"]),
+    help="Condition awaited after scrolling down instead of sleeping --scroll-wait seconds",
+)
 @click.option("--scroll-by", default=500, type=int, help="Pixels of each scroll down action")
+@click.option("--drivers", default=SELENIUM_POOL_SIZE, type=int, help="Number of pooled webdrivers used for offer pages")
+@click.option("--driver-max-pages", default=SELENIUM_DRIVER_MAX_PAGES, type=int, help="Pages rendered by pooled webdriver before it is recycled")
+@click.option("--skip-known", is_flag=True, default=False, help="Do not fetch offers unchanged since last scrape, record them as still listed.")
+@click.option("--incremental", is_flag=True, default=False, help="Store only offers that appeared after each scroll instead of whole page snapshots.")
+@click.option("--compression", default=None, type=click.Choice(["gzip", "zstd"]), help="Compress stored html pages.")
+@click.option("--raw-html", is_flag=True, default=False, help="Store pages as rendered instead of prettified.")
+@click.option("--journal", is_flag=True, default=False, help="Record scraped offers, so interrupted session can be resumed.")
+@click.option("--resume", default=None, type=str, help="Timestamp of interrupted session to continue, skipping offers it already scraped.")
 @click.option("--test-run", is_flag=True, default=False, help="Run only first 10 outputs.")
 @stepfunctions_callback_handler
-def main(storage, init_wait, scroll_wait, scroll_by, test_run):
-    assets = JustjoinitOffersScraper(
-        name='justjoinit',
-        collection='offerlist',
-        producer=SeleniumProducer(address=SELENIUM_ADDRESS),
-        storer=OverwriteStorer(storage=storage),
-        settings=JustjoinitOffersScraperSettings(
-            url="https://justjoin.it/all-locations/data",
-            init_wait=init_wait,
-            scroll_wait=scroll_wait,
-            scroll_by=scroll_by,
-        ),
-        is_test=test_run
-    ).start()
+def main(storage, init_wait, scroll_wait, wait_until, scroll_by, drivers, driver_max_pages, skip_known, incremental, compression, raw_html, journal, resume, test_run):
+    known_offers = OfferIndex(storage=storage, key="sources/justjoinit/offers/index/offers.json").load()
+    driver_pool = WebDriverPool(address=SELENIUM_ADDRESS, size=drivers, max_pages=driver_max_pages)
+    try:
+        session = JustjoinitOffersScraper(
+            name='justjoinit',
+            collection='offerlist',
+            producer=SeleniumProducer(address=SELENIUM_ADDRESS),
+            storer=OverwriteStorer(storage=storage, compression={"html": compression} if compression else None),
+            settings=JustjoinitOffersScraperSettings(
+                url="https://justjoin.it/all-locations/data",
+                init_wait=init_wait,
+                scroll_wait=scroll_wait,
+                scroll_by=scroll_by,
+                driver_pool=driver_pool,
+                known_offers=known_offers,
+                skip_known=skip_known,
+                incremental=incremental,
+                wait_until=wait_conditions[wait_until](),
+                raw_html=raw_html,
+            ),
+            is_test=test_run,
+            # Never keep more offer pages in flight than there are drivers to render them.
+            scheduler=SessionScheduler(limits={JustjoinitOfferPageScraper: drivers}),
+        )
+        if resume:
+            session.resume(resume)
+        elif journal:
+            session.enable_journal()
+        assets = session.start()
+    finally:
+        driver_pool.close()
 
     logger.info("Session output:\n" + json.dumps(assets, indent=4))
     return assets
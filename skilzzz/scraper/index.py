@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta
+import hashlib
+import json
+from pathlib import Path
+import threading
+from typing import Dict, Literal, Optional
+
+from scraper.logger import logger
+from scraper.settings import TIMESTAMP_FORMAT
+from scraper.storage import Storage
+
+
+def fingerprint(card_text: str) -> str:
+    """Cheap fingerprint of offer listing card, changes when card content changes."""
+    normalized = " ".join(card_text.split())
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+class OfferIndex:
+    """
+    Persistent index of offers seen in previous sessions.
+
+    Keyed by offer id (url slug), each entry keeps listing card fingerprint,
+    when offer was first and last seen on listing, when its page was last
+    scraped and key of the stored page. Index is loaded and saved as one
+    json file through storage.
+    """
+
+    def __init__(self, storage: Literal['fs', 's3'], key: str, max_age_days: int = 7) -> None:
+        self.storage = Storage(storage=storage)
+        self.key = Path(key)
+        self.max_age = timedelta(days=max_age_days)
+        self.offers: Dict[str, Dict[str, Optional[str]]] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> "OfferIndex":
+        if self.storage.exists(self.key):
+            self.offers = json.loads(self.storage.load(self.key))
+        logger.info(f"Loaded offer index {self.key} with {len(self.offers)} offers.")
+        return self
+
+    def save(self) -> None:
+        with self._lock:
+            content = json.dumps(self.offers).encode()
+
+        self.storage.open(self.key)
+        self.storage.write(self.key, content)
+        self.storage.close(self.key)
+
+    def get(self, offer_id: str) -> Optional[Dict[str, Optional[str]]]:
+        with self._lock:
+            entry = self.offers.get(offer_id)
+            return dict(entry) if entry else None
+
+    def is_unchanged(self, offer_id: str, offer_fingerprint: str, session_dt: datetime) -> bool:
+        """True if offer page was stored recently and its listing card did not change since."""
+        with self._lock:
+            entry = self.offers.get(offer_id)
+
+        if not entry or not entry.get("last_scraped") or not entry.get("key"):
+            return False
+
+        last_scraped = datetime.strptime(entry["last_scraped"], TIMESTAMP_FORMAT)
+        return entry["fingerprint"] == offer_fingerprint and session_dt - last_scraped < self.max_age
+
+    def listed(self, offer_id: str, offer_fingerprint: str, session_ts: str) -> None:
+        """Record that offer is still listed without fetching its page again."""
+        with self._lock:
+            entry = self.offers.setdefault(offer_id, {
+                "fingerprint": offer_fingerprint,
+                "first_seen": session_ts,
+                "last_scraped": None,
+            })
+            entry["last_seen"] = session_ts
+
+    def scraped(self, offer_id: str, offer_fingerprint: str, session_ts: str, key: str) -> None:
+        """Record that offer page was fetched and stored as key in given session."""
+        self.listed(offer_id, offer_fingerprint, session_ts)
+        with self._lock:
+            entry = self.offers[offer_id]
+            entry["fingerprint"] = offer_fingerprint
+            entry["last_scraped"] = session_ts
+            entry["key"] = key
@@ -0,0 +1,86 @@
+import json
+from pathlib import Path
+import threading
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from scraper.logger import logger
+from scraper.settings import JOURNAL_FLUSH_EVERY
+from scraper.storage import Storage
+
+# Collection, asset path and its manifest entry.
+Asset = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+class Journal:
+    """
+    Append-only checkpoint log of completed child sessions and assets they stored.
+
+    Completed sessions are buffered and written every `flush_every` entries
+    as a new numbered segment, storage does not support appending. Before
+    segment is written, `on_flush` callbacks are called so storers can make
+    outputs of journaled sessions durable. Outputs are stored in `complete`
+    under the same lock as flush, so outputs written before flush are
+    exactly outputs of sessions in its segment. Journal of interrupted
+    session is loaded back by reading segments until first missing one.
+    """
+
+    def __init__(self, storage: Literal['fs', 's3'], root: Path, flush_every: int = JOURNAL_FLUSH_EVERY) -> None:
+        self.storage = Storage(storage=storage)
+        self.root = Path(root)
+        self.flush_every = flush_every
+        self.completed: Dict[str, List[Asset]] = {}
+        self.pending = []
+        self.segment = 0
+        self.callbacks: List[Callable[[int], None]] = []
+        self._lock = threading.RLock()
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / f"journal-{segment:05}.jsonl"
+
+    def load(self) -> "Journal":
+        while self.storage.exists(path := self._segment_path(self.segment)):
+            for line in self.storage.load(path).splitlines():
+                entry = json.loads(line)
+                self.completed[entry["session"]] = entry["assets"]
+            self.segment += 1
+
+        logger.info(f"Loaded journal {self.root} with {len(self.completed)} completed sessions.")
+        return self
+
+    def on_flush(self, callback: Callable[[int], None]) -> None:
+        """Register callback called with number of the next segment before every flush."""
+        self.callbacks.append(callback)
+
+    def is_completed(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self.completed
+
+    def assets(self, session_id: str) -> List[Asset]:
+        with self._lock:
+            return self.completed[session_id]
+
+    def complete(self, session_id: str, store: Callable[[], List[Asset]]) -> None:
+        """Store outputs of completed session with `store` and record assets it returns."""
+        with self._lock:
+            assets = store()
+            self.completed[session_id] = assets
+            self.pending.append({"session": session_id, "assets": assets})
+            if len(self.pending) >= self.flush_every:
+                self.flush()
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self.pending:
+                return
+
+            for callback in self.callbacks:
+                callback(self.segment + 1)
+
+            path = self._segment_path(self.segment)
+            content = "".join(json.dumps(entry) + "\n" for entry in self.pending)
+            self.storage.open(path)
+            self.storage.write(path, content.encode())
+            self.storage.close(path)
+
+            self.segment += 1
+            self.pending = []
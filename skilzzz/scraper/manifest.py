@@ -0,0 +1,57 @@
+import json
+from pathlib import Path
+import threading
+from typing import Any, Dict, List, Literal, Optional
+
+from scraper.logger import logger
+from scraper.settings import MANIFEST_NAME
+from scraper.storage import Storage
+
+
+class SessionManifest:
+    """
+    Assets stored by session tree, grouped by session folder (`ts=` partition).
+
+    Every asset entry keeps key, size and sha256 of stored content (before
+    compression) and metadata given by output, e.g. offer id and index.
+    Outputs appended to the same asset are merged into one entry, its hash
+    is dropped as records of concurrent sessions can be interleaved.
+    When session ends manifest is written next to assets of every partition,
+    so consumers can read exact list of inputs instead of listing storage.
+    Manifest of failed session lists assets stored before failure and is
+    marked incomplete.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._partitions: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def add(self, folder: str, asset_path: str, entry: Optional[Dict[str, Any]] = None) -> None:
+        entry = {"key": asset_path, "size": None, "sha256": None, "records": 1, **(entry or {})}
+        with self._lock:
+            assets = self._partitions.setdefault(folder, {})
+            if (previous := assets.get(asset_path)) is None:
+                assets[asset_path] = entry
+                return
+
+            previous["records"] += entry["records"]
+            previous["sha256"] = None
+            if previous["size"] is not None and entry["size"] is not None:
+                previous["size"] += entry["size"]
+
+    def save(self, storage: Literal['fs', 's3'], complete: bool = True) -> List[str]:
+        storage = Storage(storage=storage)
+        with self._lock:
+            partitions = {folder: sorted(assets.values(), key=lambda entry: entry["key"])
+                          for folder, assets in self._partitions.items()}
+
+        paths = []
+        for folder, assets in partitions.items():
+            path = Path(folder) / MANIFEST_NAME
+            content = json.dumps({"session": folder, "complete": complete, "assets": assets}, indent=4).encode()
+            storage.open(path)
+            storage.write(path, content)
+            storage.close(path)
+            logger.info(f"Written {'' if complete else 'incomplete '}manifest of {len(assets)} assets to {path}.")
+            paths.append(str(path))
+        return paths
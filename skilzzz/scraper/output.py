@@ -1,17 +1,29 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 import json
-from typing import Any, Dict
+import typing
+from typing import Any, Dict, List, Type
+
+from pydantic import BaseModel
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
 
 from scraper.producer.html.html import HTMLResponse
-from scraper import logger
+from scraper.logger import logger
 
 
 class Output(ABC):
 
-    def __init__(self, key: str, content: Any):
+    def __init__(self, key: str, content: Any, metadata: Dict[str, Any] = None):
         self.key = key
         self.content = content
+        # Recorded in session manifest next to stored asset.
+        self.metadata = metadata or {}
+        self.size = None
+        self.sha256 = None
         self.session = None
 
     @abstractmethod
@@ -36,15 +48,82 @@ class DictOutput(Output):
         return str.encode(jsonl_string)
             
 
+class JSONLinesOutput(Output):
+    """Many records stored as lines of single jsonl asset."""
+    format = 'jsonl'
+
+    def __init__(self, key: str, content: List[Dict[str, Any]], metadata: Dict[str, Any] = None):
+        super().__init__(key, content, metadata=metadata)
+
+    def serialize(self) -> bytes:
+        return str.encode("".join(json.dumps(record, default=str) + "\n" for record in self.content))
+
+
 class HTMLOutput(Output):
     format = 'html'
 
-    def __init__(self, key: str, content: HTMLResponse):
-        super().__init__(key, content)
+    def __init__(self, key: str, content: HTMLResponse, raw: bool = False, metadata: Dict[str, Any] = None):
+        super().__init__(key, content, metadata=metadata)
+        self.raw = raw
 
     def serialize(self) -> bytes:
+        # Raw mode writes document bytes unchanged, without parsing it.
+        if self.raw:
+            return self.content.raw
+
         try:
             html_string = self.content.html.prettify()
         except AttributeError as e:
-            logger.warning("")
-        return str.encode(html_string)
\ No newline at end of file
+            logger.warning(f"Cannot prettify {self.key}, storing it unchanged. {e}")
+            return self.content.raw
+        return str.encode(html_string)
+
+
+ARROW_TYPES = {
+    str: "string",
+    int: "int64",
+    float: "float64",
+    bool: "bool_",
+}
+
+
+def arrow_type(annotation) -> "pa.DataType":
+    """Arrow type of pydantic field annotation."""
+    origin = typing.get_origin(annotation)
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+
+    if origin in (list, typing.List):
+        return pa.list_(arrow_type(args[0]))
+    if origin is typing.Union and len(args) == 1:
+        return arrow_type(args[0])
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return pa.struct(list(arrow_schema(annotation)))
+    if annotation in ARROW_TYPES:
+        return getattr(pa, ARROW_TYPES[annotation])()
+    raise TypeError(f"Cannot convert {annotation} to arrow type.")
+
+
+def arrow_schema(model: Type[BaseModel], prefix: Dict[str, type] = None) -> "pa.Schema":
+    """
+    Arrow schema following pydantic model, columns are named by field aliases
+    as in `model_dump(by_alias=True)`. `prefix` columns are put before model fields.
+    """
+    if pa is None:
+        raise ValueError("Parquet output requires pyarrow package.")
+
+    fields = [pa.field(name, arrow_type(annotation)) for name, annotation in (prefix or {}).items()]
+    for name, field in model.model_fields.items():
+        fields.append(pa.field(field.alias or name, arrow_type(field.annotation)))
+    return pa.schema(fields)
+
+
+class ParquetOutput(Output):
+    """Single row of parquet file, rows are written in row groups by ParquetStorer."""
+    format = 'parquet'
+
+    def __init__(self, key: str, content: Dict[str, Any], schema: "pa.Schema"):
+        super().__init__(key, content)
+        self.schema = schema
+
+    def serialize(self) -> Dict[str, Any]:
+        return self.content
@@ -0,0 +1,58 @@
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from typing import Callable, Literal, Optional
+
+from scraper.settings import PARSE_CACHE_ROOT
+from scraper.storage import Storage
+
+
+def parser_fingerprint(version: str, parser: Callable) -> str:
+    """
+    Hash of parser registry entry. Changes when entry points to another function
+    or when source of any module of parser package changes, e.g. its schema.
+    """
+    fingerprint = hashlib.sha256(f"{version}:{parser.__module__}.{parser.__qualname__}".encode())
+    for module in sorted(Path(inspect.getfile(parser)).parent.glob("*.py")):
+        fingerprint.update(module.read_bytes())
+    return fingerprint.hexdigest()
+
+
+class ParseCache:
+    """
+    Parse results keyed by sha256 of html and parser fingerprint, stored through storage.
+
+    Results of every parser fingerprint are kept under their own root, so
+    changing the parser invalidates the cache without deleting anything.
+    """
+
+    def __init__(
+        self,
+        storage: Literal['fs', 's3'],
+        name: str,
+        version: str,
+        parser: Callable,
+        root: str = PARSE_CACHE_ROOT,
+    ) -> None:
+        self.storage_type = storage
+        self.storage = Storage(storage=storage)
+        self.root = Path(root) / name / f"{version}-{parser_fingerprint(version, parser)[:16]}"
+
+    @staticmethod
+    def key(content: bytes) -> str:
+        return hashlib.sha256(content).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.storage.exists(path := self._path(key)):
+            return None
+        return json.loads(self.storage.load(path))
+
+    def put(self, key: str, result: dict) -> None:
+        path = self._path(key)
+        self.storage.open(path)
+        self.storage.write(path, json.dumps(result).encode())
+        self.storage.close(path)
@@ -1,9 +1,14 @@
+from scraper.parsers.justjoinit.justjoinit__offers_v2 import parse_offer as v2
 from scraper.parsers.justjoinit.justjoinit__offers_v1 import parse_offer as v1
 from scraper.parsers.justjoinit.justjoinit__offers_v0 import parse_offer as v0
 
 parsers = {
     "v0": v0,
     "v1": v1,
+    "v2": v2,
 }
 
-
+# Parsers taking html content instead of BeautifulSoup document.
+html_parsers = {"v2"}
+# Parsers of JobOffer schema, called with validate=False when offers are validated in batches.
+schema_parsers = {"v1", "v2"}
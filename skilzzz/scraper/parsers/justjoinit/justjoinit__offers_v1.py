@@ -6,7 +6,7 @@ from bs4 import BeautifulSoup
 from scraper.parsers.exceptions import InvalidHTMLDocument
 from scraper.logger import logger
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 
 class Skill(BaseModel):
     skill_name: str
@@ -18,7 +18,8 @@ class SalaryType(BaseModel):
     employment_type: str
     currency: str
 
-    @validator("from_", "to", pre=True)
+    @field_validator("from_", "to", mode="before")
+    @classmethod
     def parse_salary_amount(cls, value: str) -> int:
         if isinstance(value, str):
             return int(value.replace(" ", ""))
@@ -36,7 +37,7 @@ class JobOffer(BaseModel):
     operating_mode: str
     description: str
 
-def parse_offer(soup: BeautifulSoup):
+def parse_offer(soup: BeautifulSoup, validate: bool = True):
 
     job_offer = {}
 
@@ -114,7 +115,8 @@ def parse_offer(soup: BeautifulSoup):
     job_descripion = description_section.text
     job_offer['description'] = job_descripion
 
-    # Schema Validation
-    JobOffer.model_rebuild()
+    # Schema Validation, skipped when offers are validated in batches.
+    if not validate:
+        return job_offer
     job_offer = JobOffer.model_validate(job_offer)
     return job_offer.model_dump(by_alias=True)
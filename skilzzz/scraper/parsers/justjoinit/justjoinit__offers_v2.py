@@ -0,0 +1,193 @@
+"""
+Same extraction as v1, on lxml tree instead of BeautifulSoup.
+
+Every element is found with XPath compiled once at import. Headings found
+in v1 by comparing text of every tag are looked up through text nodes
+holding a fragment of the heading, so text is computed only for few
+ancestors of them and heading split across inline tags is found as in v1.
+Text and sibling helpers follow BeautifulSoup semantics (`.text` without
+script, style and comments, `.next_sibling` counting text nodes), so
+output is identical to v1.
+"""
+
+import re
+from typing import Optional, Union
+
+from lxml import etree, html
+
+from scraper.parsers.exceptions import InvalidHTMLDocument
+from scraper.parsers.justjoinit.justjoinit__offers_v1 import JobOffer
+from scraper.logger import logger
+
+XPath = etree.XPath
+
+FIELDS = {
+    "title": XPath("descendant::h1[@class][1]"),
+    "company": XPath("descendant::svg[@data-testid='ApartmentRoundedIcon'][1]/.."),
+    "city": XPath("descendant::svg[@data-testid='PlaceOutlinedIcon'][1]/.."),
+    "tech_stack": XPath(
+        "descendant::text()[normalize-space(.)][contains('tech stack', translate(normalize-space(.), 'TECHSAK', 'techsak'))]"
+    ),
+    "skills_list": XPath("descendant::ul[1]"),
+    "skill_names": XPath("descendant::h6"),
+    "skill_seniority": XPath("(../descendant::span)[1]"),
+    "salary_list": XPath("descendant::div[ancestor::div][1]"),
+    "salary_divs": XPath("div"),
+    "salary_span": XPath("descendant::span[1]"),
+    "salary_amounts": XPath("descendant::span"),
+    "salary_strings": XPath("descendant::text()"),
+    "info_section": XPath("../../../following-sibling::div[1]"),
+    "info_divs": XPath("div"),
+    "info_key_value": XPath("descendant::div[1]/following-sibling::div[1]/descendant::div"),
+    "description_title": XPath(
+        "descendant::text()[normalize-space(.)]"
+        "[contains('job description', translate(normalize-space(.), 'JOBDESCRIPTN', 'jobdescriptn'))]"
+    ),
+    "description_section": XPath("../following-sibling::div[1]"),
+}
+
+CURRENCY = re.compile('[A-Z]{3}')
+# Text of these is not part of BeautifulSoup `.text`.
+SKIPPED_TEXT = {"script", "style", "template"}
+PARSER = html.HTMLParser(encoding="utf-8")
+
+
+def text(element: html.HtmlElement) -> str:
+    """Text of element like BeautifulSoup `.text`."""
+    parts = []
+
+    def collect(element):
+        if not isinstance(element.tag, str) or element.tag in SKIPPED_TEXT:
+            return
+        if element.text:
+            parts.append(element.text)
+        for child in element:
+            collect(child)
+            if child.tail:
+                parts.append(child.tail)
+
+    collect(element)
+    return "".join(parts)
+
+
+def next_node(element: html.HtmlElement, steps: int = 1) -> Optional[Union[html.HtmlElement, str]]:
+    """Node `steps` siblings after element, counting text nodes like BeautifulSoup `.next_sibling`."""
+    nodes = [element.tail] if element.tail else []
+    for sibling in element.itersiblings():
+        if len(nodes) >= steps:
+            break
+        nodes.append(sibling)
+        if sibling.tail:
+            nodes.append(sibling.tail)
+    return nodes[steps - 1] if len(nodes) >= steps else None
+
+
+def find_heading(document: html.HtmlElement, candidates: XPath, heading: str, tag_prefix: str = "") -> Optional[html.HtmlElement]:
+    """First element in document order with text equal to heading, like v1 `soup.find(lambda tag: ...)`."""
+    for string in candidates(document):
+        # Text node is text of its parent or tail of its preceding sibling.
+        element = string.getparent()
+        if string.is_tail:
+            element = element.getparent()
+
+        # Climb while text is still part of heading. Ancestors with the same text come first in document order.
+        found = None
+        while element is not None:
+            element_text = text(element).strip().lower()
+            if element_text == heading:
+                if isinstance(element.tag, str) and element.tag.startswith(tag_prefix):
+                    found = element
+            elif " ".join(element_text.split()) not in heading:
+                break
+            element = element.getparent()
+        if found is not None:
+            return found
+    return None
+
+
+def parse_offer(document: Union[str, bytes, html.HtmlElement], validate: bool = True):
+    if isinstance(document, str):
+        document = document.encode('utf-8')
+    if isinstance(document, bytes):
+        document = html.document_fromstring(document, parser=PARSER)
+
+    job_offer = {}
+
+    # Title
+    if not (job_title := FIELDS["title"](document)):
+        raise InvalidHTMLDocument("Invalid HTML offer. Title cannot be found.")
+
+    job_title = job_title[0]
+    job_offer['title'] = text(job_title).strip()
+
+    # Company
+    job_offer['company'] = text(FIELDS["company"](document)[0]).strip()
+
+    # Location - City
+    job_offer['city'] = text(FIELDS["city"](document)[0]).strip()
+
+    # Skills
+    tech_stack_title = find_heading(document, FIELDS["tech_stack"], "tech stack")
+    if tech_stack_title is None or (skills_section := tech_stack_title.getparent()) is None:
+        raise InvalidHTMLDocument("Invalid HTML offer. Skills (Tech Stack) section cannot be found.")
+
+    job_skills = []
+    for skill_h6 in FIELDS["skill_names"](FIELDS["skills_list"](skills_section)[0]):
+        job_skills.append(
+            {
+                "skill_name": text(skill_h6).strip(),
+                "skill_seniorty": text(FIELDS["skill_seniority"](skill_h6)[0]).strip()
+            }
+        )
+
+    job_offer['skills'] = job_skills
+
+    # Salary
+    salary_types = []
+    salary_section = next_node(job_title, steps=2)
+    if isinstance(salary_section, str):
+        raise InvalidHTMLDocument("Invalid HTML offer. Salary section cannot be found.")
+
+    if salary_section is not None:
+        for salary_div in FIELDS["salary_divs"](FIELDS["salary_list"](salary_section)[0]):
+            salary_span = FIELDS["salary_span"](salary_div)[0]
+
+            salaries = [text(span) for span in FIELDS["salary_amounts"](salary_span)]
+            match len(salaries):
+                case 1: job_salary_from = job_salary_to = salaries[0]
+                case 2: job_salary_from, job_salary_to = salaries
+                case _: logger.warning("Didn't parse salaries! Investigate whats wrong.")
+
+            salary_type = next_node(salary_span)
+            salary_currency = next(
+                (str(string) for string in FIELDS["salary_strings"](salary_span) if CURRENCY.search(string)),
+                None,
+            )
+            salary_types.append({
+                "from": job_salary_from,
+                "to": job_salary_to,
+                "employment_type": salary_type if isinstance(salary_type, str) else text(salary_type),
+                "currency": salary_currency
+            })
+
+    job_offer['salary_types'] = salary_types
+
+    # Additional Info
+    info_section = FIELDS["info_section"](job_title)[0]
+    for info_div in FIELDS["info_divs"](info_section):
+        key, value = FIELDS["info_key_value"](info_div)
+        snake_case_key = text(key).lower().strip().replace(' ', '_')
+        job_offer[snake_case_key] = text(value).strip()
+
+    # Description
+    job_descripion_title = find_heading(document, FIELDS["description_title"], "job description", tag_prefix="h")
+    if job_descripion_title is None:
+        raise InvalidHTMLDocument("Invalid HTML offer. Job description cannot be found.")
+    description_section = FIELDS["description_section"](job_descripion_title)[0]
+    job_offer['description'] = text(description_section)
+
+    # Schema Validation, skipped when offers are validated in batches.
+    if not validate:
+        return job_offer
+    job_offer = JobOffer.model_validate(job_offer)
+    return job_offer.model_dump(by_alias=True)
@@ -0,0 +1,41 @@
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from pydantic import TypeAdapter, ValidationError
+
+from scraper.parsers.justjoinit.justjoinit__offers_v1 import JobOffer
+
+# Built once, validation schema is not rebuilt per offer.
+offers_adapter = TypeAdapter(List[JobOffer])
+
+
+def validate_offers(
+    offers: List[Dict[str, Any]], reserialize: bool = True
+) -> Tuple[List[Optional[Union[Dict[str, Any], JobOffer]]], List[Dict[str, Any]]]:
+    """
+    Validate parsed offers with single call of prebuilt adapter.
+
+    Returns list aligned with offers, with None in place of invalid offers,
+    and error records `{"index", "errors": [{"loc", "msg", "type"}]}` instead
+    of raising. Valid offers are dumped to dicts by alias, with `reserialize`
+    off validated JobOffer models are returned as they are.
+    """
+    invalid = defaultdict(list)
+    try:
+        models = offers_adapter.validate_python(offers)
+    except ValidationError as e:
+        for error in e.errors(include_url=False, include_input=False):
+            index, *loc = error["loc"]
+            invalid[index].append({"loc": loc, "msg": error["msg"], "type": error["type"]})
+        # Only valid offers are left, second validation cannot fail.
+        models = offers_adapter.validate_python([
+            offer for index, offer in enumerate(offers) if index not in invalid
+        ])
+
+    if reserialize:
+        models = offers_adapter.dump_python(models, by_alias=True)
+
+    models = iter(models)
+    validated = [None if index in invalid else next(models) for index in range(len(offers))]
+    errors = [{"index": index, "errors": offer_errors} for index, offer_errors in sorted(invalid.items())]
+    return validated, errors
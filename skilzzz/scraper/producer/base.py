@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Generator, Iterable, Optional, Tuple, TypeVar
+
 from bs4 import BeautifulSoup
 
+from scraper.logger import logger
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
 
 class Response(ABC):
     ...
@@ -25,3 +33,35 @@ class Producer(ABC):
         ...
 
 
+
+
+def get_many(
+    get: Callable[[Item], Result], items: Iterable[Item], window: int, workers: int, name: str = "get_many"
+) -> Generator[Tuple[Item, Optional[Result]], None, None]:
+    """
+    Call `get` for items concurrently and yield (item, result) in completion order.
+    At most `window` items are fetched or waiting to be consumed at once, items
+    are taken lazily. Result of item that failed is None, so one failure does
+    not stop fetching the rest.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name) as executor:
+        pending = {}
+        for item in items:
+            pending[executor.submit(get, item)] = item
+            if len(pending) >= window:
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                item = pending.pop(future)
+                # Keep window full while consumer works on finished item.
+                if (next_item := next(items, None)) is not None:
+                    pending[executor.submit(get, next_item)] = next_item
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to get {item}. {e}")
+                    result = None
+                yield item, result
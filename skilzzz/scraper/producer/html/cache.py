@@ -0,0 +1,157 @@
+from collections import OrderedDict
+from functools import partial
+import hashlib
+import json
+from pathlib import Path
+import threading
+import time
+from typing import Generator, Iterable, Literal, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from scraper.logger import logger
+from scraper.producer.base import get_many
+from scraper.producer.html.html import HTMLProducer, HTMLResponse
+from scraper.producer.html.rest import RESTProducer
+from scraper.settings import HTTP_CACHE_MAX_BYTES, HTTP_CACHE_ROOT, HTTP_CACHE_TTL, PREFETCH_WINDOW
+from scraper.storage import Storage
+
+
+class CachedProducer(HTMLProducer):
+    """
+    HTTP cache wrapped around `RESTProducer` or `SplashProducer`.
+
+    Responses are stored through storage keyed by url. Cached response is
+    served without network while younger than `ttl`, after that it is
+    revalidated with If-None-Match / If-Modified-Since when server sent
+    ETag or Last-Modified, otherwise fetched again. Least recently used
+    entries are evicted when cache grows over `max_bytes`.
+    """
+
+    def __init__(
+        self,
+        producer: RESTProducer,
+        storage: Literal['fs', 's3'] = 'fs',
+        root: str = HTTP_CACHE_ROOT,
+        ttl: float = HTTP_CACHE_TTL,
+        max_bytes: int = HTTP_CACHE_MAX_BYTES,
+    ) -> None:
+        self.producer = producer
+        self.storage = Storage(storage=storage)
+        self.root = Path(root)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.index_path = self.root / "index.json"
+        self._lock = threading.Lock()
+
+        # url -> entry, ordered from least to most recently used
+        self.entries = OrderedDict()
+        if self.storage.exists(self.index_path):
+            self.entries = OrderedDict(json.loads(self.storage.load(self.index_path)))
+        self.size = sum(entry["size"] for entry in self.entries.values())
+
+    def _key(self, url: str) -> Path:
+        return self.root / f"{hashlib.sha256(url.encode()).hexdigest()}.html"
+
+    def _hit(self, url: str) -> Optional[HTMLResponse]:
+        """Cached response, None when entry was evicted or its file deleted meanwhile."""
+        with self._lock:
+            if (entry := self.entries.get(url)) is None:
+                return None
+            self.entries.move_to_end(url)
+
+        try:
+            # Bytes as received, encoding is detected by parser as on miss.
+            return HTMLResponse(self.storage.read(Path(entry["key"])), url=url)
+        except (FileNotFoundError, ClientError) as e:
+            logger.warning(f"Cached response of {url} is missing. {e}")
+            with self._lock:
+                if self.entries.get(url) is entry:
+                    del self.entries[url]
+                    self.size -= entry["size"]
+            return None
+
+    def _put(self, url: str, content: bytes, headers) -> None:
+        key = self._key(url)
+        self.storage.open(key)
+        self.storage.write(key, content)
+        self.storage.close(key)
+
+        with self._lock:
+            if (previous := self.entries.pop(url, None)):
+                self.size -= previous["size"]
+            self.entries[url] = {
+                "key": str(key),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "stored_at": time.time(),
+                "size": len(content),
+            }
+            self.size += len(content)
+            evicted = self._evict()
+
+        for entry in evicted:
+            self.storage.delete(Path(entry["key"]))
+
+    def _evict(self) -> list:
+        evicted = []
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, entry = self.entries.popitem(last=False)
+            self.size -= entry["size"]
+            evicted.append(entry)
+        return evicted
+
+    def get(self, url, wait_time: int = None) -> HTMLResponse:
+        with self._lock:
+            entry = self.entries.get(url)
+
+        if entry and time.time() - entry["stored_at"] < self.ttl:
+            if (cached := self._hit(url)) is not None:
+                logger.debug(f"Serving {url} from cache.")
+                return cached
+            entry = None
+
+        headers = {}
+        if entry and entry["etag"]:
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry["last_modified"]:
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = self.producer._fetch(url, wait_time, headers=headers or None)
+        if response.status_code == 304 and entry:
+            logger.debug(f"Revalidated {url} in cache.")
+            with self._lock:
+                entry["stored_at"] = time.time()
+            if (cached := self._hit(url)) is not None:
+                return cached
+            # Evicted while revalidated, fetch whole response without validators.
+            response = self.producer._fetch(url, wait_time)
+
+        if response.status_code == 200:
+            self._put(url, response.content, response.headers)
+
+        return HTMLResponse(response.content, url=url)
+
+    def get_many(
+        self, urls: Iterable[str], wait_time: int = None, window: int = PREFETCH_WINDOW
+    ) -> Generator[Tuple[str, Optional[HTMLResponse]], None, None]:
+        return get_many(partial(self.get, wait_time=wait_time), urls, window=window, workers=self.producer.pool_size, name="http")
+
+    def save(self) -> None:
+        with self._lock:
+            content = json.dumps(list(self.entries.items())).encode()
+
+        self.storage.open(self.index_path)
+        self.storage.write(self.index_path, content)
+        self.storage.close(self.index_path)
+
+    def on_output_stored(self):
+        self.producer.on_output_stored()
+
+    def on_session_end(self):
+        self.save()
+        self.producer.on_session_end()
+
+    def on_session_fail(self):
+        self.save()
+        self.producer.on_session_fail()
@@ -1,12 +1,39 @@
 from abc import ABC, abstractmethod
+from typing import Union
 
 from bs4 import BeautifulSoup
 
 from scraper.producer.base import Producer, Response
 
-class HTMLResponse(BeautifulSoup, Response):
-    def __init__(self, html) -> None:
-        super().__init__(html, "lxml")
+class HTMLResponse(Response):
+    """
+    Fetched HTML document. Original bytes are kept as received and
+    BeautifulSoup tree is built only on first access, responses that
+    are just stored are never parsed.
+    """
+
+    def __init__(self, html: Union[str, bytes], url: str = None) -> None:
+        # Text is encoded once, bytes are kept with encoding detected by parser.
+        if isinstance(html, str):
+            self.raw = html.encode("utf-8")
+            self.encoding = "utf-8"
+        else:
+            self.raw = html
+            self.encoding = None
+        self.url = url
+        self._soup = None
+
+    @property
+    def soup(self) -> BeautifulSoup:
+        if self._soup is None:
+            self._soup = BeautifulSoup(self.raw, "lxml", from_encoding=self.encoding)
+        return self._soup
+
+    def __getattr__(self, name):
+        # Behave like parsed document for code selecting from response.
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.soup, name)
 
 class HTMLProducer(Producer, ABC):
     
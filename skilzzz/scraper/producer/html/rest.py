@@ -1,15 +1,71 @@
 
+from functools import partial
 import time
+from typing import Generator, Iterable, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
+from scraper.producer.base import get_many
 from scraper.producer.html.html import HTMLProducer, HTMLResponse
+from scraper.producer.ratelimit import RateLimiter, rate_limiter
+from scraper.settings import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_TIMEOUT, PREFETCH_WINDOW
+
+
+def create_http_session(pool_size: int = HTTP_POOL_SIZE, retries: int = HTTP_RETRIES) -> requests.Session:
+    """Session with keep-alive connection pool and retries on connection errors and 5xx."""
+    retry = Retry(
+        total=retries,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 class RESTProducer(HTMLProducer):
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        pool_size: int = HTTP_POOL_SIZE,
+        timeout: float = HTTP_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        limiter: RateLimiter = rate_limiter,
+    ) -> None:
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.limiter = limiter
+        self.session = create_http_session(pool_size=pool_size, retries=retries)
         super().__init__()
 
+    def _request_url(self, url, wait_time: int = None) -> str:
+        return url
+
+    def _fetch(self, url, wait_time: int = None, headers: dict = None) -> requests.Response:
+        self.limiter.acquire(url)
+        response = self.session.get(self._request_url(url, wait_time), headers=headers, timeout=self.timeout)
+        self.limiter.feedback(url, response.status_code, response.headers.get("Retry-After"))
+        return response
+
     def get(self, url, wait_time: int = None) -> HTMLResponse:
         if wait_time:
             time.sleep(wait_time)
-        response = requests.get(url)
-        return HTMLResponse(response.text)
\ No newline at end of file
+        response = self._fetch(url)
+        return HTMLResponse(response.content, url=url)
+
+    def get_many(
+        self, urls: Iterable[str], wait_time: int = None, window: int = PREFETCH_WINDOW
+    ) -> Generator[Tuple[str, Optional[HTMLResponse]], None, None]:
+        """
+        Fetch urls concurrently over pooled connections and yield (url, response)
+        as they complete. At most `window` urls are requested or waiting to be
+        consumed at once. Response of url that failed is None.
+        """
+        return get_many(partial(self._get, wait_time=wait_time), urls, window=window, workers=self.pool_size, name="http")
+
+    def _get(self, url, wait_time: int = None) -> HTMLResponse:
+        return HTMLResponse(self._fetch(url, wait_time).content, url=url)
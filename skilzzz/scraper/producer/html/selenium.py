@@ -1,60 +1,314 @@
+from abc import ABC, abstractmethod
+import queue
 import sys
+import threading
 import time
 from typing import Any, Generator
 
 from selenium import webdriver
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.support.ui import WebDriverWait
 
 from scraper.logger import logger
 
 from scraper.producer.html.html import HTMLProducer, HTMLResponse
+from scraper.producer.ratelimit import RateLimiter, rate_limiter
 
 
-class SeleniumProducer(HTMLProducer):
-    def __init__(self, address, timeout=60, custom_ua=None):
-        # Connect to remote selenum driver
-        logger.info(f"Connecting to selenium remote driver at {address}")
-        options = webdriver.ChromeOptions()
-        options.add_argument("--ignore-ssl-errors=yes")
-        options.add_argument("--ignore-certificate-errors")
+def connect_webdriver(address, timeout=60, custom_ua=None) -> webdriver.Remote:
+    # Connect to remote selenum driver
+    logger.info(f"Connecting to selenium remote driver at {address}")
+    options = webdriver.ChromeOptions()
+    options.add_argument("--ignore-ssl-errors=yes")
+    options.add_argument("--ignore-certificate-errors")
+
+    if custom_ua:
+        options.add_argument(f"user-agent={custom_ua}")
+
+
+    for _ in range(timeout):
+        try:
+            driver = webdriver.Remote(
+                command_executor=f"http://{address}/wd/hub", options=options
+            )
+            logger.info("Established connection with remote selenium webdriver")
+            return driver
+        except:
+            logger.warning(
+                "Unable to connect to remote driver, retring in 1 second."
+            )
+            time.sleep(1)
+    else:
+        raise TimeoutError(
+            f"Connecting to remote selenium server timeout after {timeout} seconds"
+        )
+
+
+class WebDriverPool:
+    """
+    Bounded pool of remote webdrivers shared by many sessions.
+
+    Drivers are created lazily up to `size`, health checked before they are
+    handed out, recycled after `max_pages` rendered pages and replaced when
+    returned as broken.
+    """
 
-        if custom_ua:
-            options.add_argument(f"user-agent={custom_ua}")
+    def __init__(self, address, size=4, max_pages=50, timeout=60, custom_ua=None):
+        self.address = address
+        self.size = size
+        self.max_pages = max_pages
+        self.timeout = timeout
+        self.custom_ua = custom_ua
 
+        self._idle = queue.LifoQueue()
+        self._pages = {}
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._closed = False
 
-        for _ in range(timeout):
+    def acquire(self) -> webdriver.Remote:
+        """Borrow a healthy driver, blocking while all of them are in use."""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    driver = self._idle.get_nowait()
+                except queue.Empty:
+                    driver = connect_webdriver(
+                        self.address, timeout=self.timeout, custom_ua=self.custom_ua
+                    )
+                    with self._lock:
+                        self._pages[driver] = 0
+                    return driver
+
+                if self.is_healthy(driver):
+                    return driver
+
+                logger.warning("Pooled webdriver failed health check. Replacing it.")
+                self._discard(driver)
+        except:
+            self._slots.release()
+            raise
+
+    def release(self, driver: webdriver.Remote, pages: int = 0, broken: bool = False) -> None:
+        """Return a borrowed driver. Broken or worn out drivers are quit."""
+        try:
+            with self._lock:
+                self._pages[driver] = self._pages.get(driver, 0) + pages
+                used_pages = self._pages[driver]
+
+            if broken or self._closed:
+                self._discard(driver)
+            elif used_pages >= self.max_pages:
+                logger.info(f"Recycling webdriver after {used_pages} pages.")
+                self._discard(driver)
+            else:
+                self._idle.put(driver)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        logger.info("Closing all pooled webdrivers.")
+        self._closed = True
+        while True:
             try:
-                self.webdriver = webdriver.Remote(
-                    command_executor=f"http://{address}/wd/hub", options=options
-                )
-                logger.info("Established connection with remote selenium webdriver")
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
                 break
-            except:
-                logger.warning(
-                    "Unable to connect to remote driver, retring in 1 second."
-                )
-                time.sleep(1)
-        else:
-            raise TimeoutError(
-                "Connecting to remote selenium server timeout after {} seconds"
-            )
+
+    def is_healthy(self, driver: webdriver.Remote) -> bool:
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            # Dead remote fails with connection errors, not only WebDriverException.
+            return False
+
+    def _discard(self, driver: webdriver.Remote) -> None:
+        # Never raises, so caller always gets to release the slot of discarded driver.
+        with self._lock:
+            self._pages.pop(driver, None)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Unable to quit webdriver cleanly. {e}")
+
+
+class WaitCondition(ABC):
+    """
+    Condition for `WebDriverWait.until`. `before` is called right before
+    the scroll condition waits for, or right after navigation on page load
+    as state of previous page is gone with it, so condition can remember
+    state of page to compare with.
+    """
+
+    def before(self, driver: webdriver.Remote) -> None:
+        ...
+
+    @abstractmethod
+    def __call__(self, driver: webdriver.Remote) -> bool:
+        ...
+
+
+class DOMQuiet(WaitCondition):
+    """True when DOM did not change for `quiet_ms` milliseconds."""
+
+    def __init__(self, quiet_ms: int = 500) -> None:
+        self.quiet_ms = quiet_ms
+
+    def before(self, driver: webdriver.Remote) -> None:
+        # Quiet period is counted from the action, not from last mutation before it.
+        driver.execute_script("window.__scraperLastMutation = performance.now();")
+
+    def __call__(self, driver: webdriver.Remote) -> bool:
+        javascript = """
+            if (!window.__scraperObserver) {
+                window.__scraperLastMutation = performance.now();
+                window.__scraperObserver = new MutationObserver(() => {
+                    window.__scraperLastMutation = performance.now();
+                });
+                window.__scraperObserver.observe(
+                    document, { childList: true, subtree: true, attributes: true, characterData: true }
+                );
+            }
+            return performance.now() - window.__scraperLastMutation;
+        """
+        return driver.execute_script(javascript) >= self.quiet_ms
+
+
+class NetworkIdle(WaitCondition):
+    """True when no resource finished loading for `quiet_ms` milliseconds."""
+
+    def __init__(self, quiet_ms: int = 500, buffer_size: int = 1000) -> None:
+        self.quiet_ms = quiet_ms
+        self.buffer_size = buffer_size
+
+    def before(self, driver: webdriver.Remote) -> None:
+        # Full timing buffer (250 entries by default) drops new entries, page would look idle.
+        driver.execute_script(
+            """
+            performance.clearResourceTimings();
+            performance.setResourceTimingBufferSize(arguments[0]);
+            window.__scraperIdleSince = performance.now();
+            """,
+            self.buffer_size,
+        )
+
+    def __call__(self, driver: webdriver.Remote) -> bool:
+        javascript = """
+            const entries = performance.getEntriesByType('resource');
+            const lastResponse = entries.reduce(
+                (last, entry) => Math.max(last, entry.responseEnd), window.__scraperIdleSince || 0
+            );
+            return performance.now() - lastResponse;
+        """
+        return driver.execute_script(javascript) >= self.quiet_ms
+
+
+class NewElementsAppeared(WaitCondition):
+    """True when element with higher `index_attribute` than before appeared."""
+
+    javascript = """
+        const [selector, indexAttribute] = arguments;
+        let maxIndex = -1;
+        for (const element of document.querySelectorAll(selector)) {
+            maxIndex = Math.max(maxIndex, parseInt(element.getAttribute(indexAttribute)));
+        }
+        return maxIndex;
+    """
+
+    def __init__(self, selector: str = "[data-index]", index_attribute: str = "data-index") -> None:
+        self.selector = selector
+        self.index_attribute = index_attribute
+        self.max_index = -1
+
+    def _max_index(self, driver: webdriver.Remote) -> int:
+        return driver.execute_script(self.javascript, self.selector, self.index_attribute)
+
+    def before(self, driver: webdriver.Remote) -> None:
+        self.max_index = self._max_index(driver)
+
+    def __call__(self, driver: webdriver.Remote) -> bool:
+        return self._max_index(driver) > self.max_index
+
+
+class SeleniumProducer(HTMLProducer):
+    def __init__(self, address=None, timeout=60, custom_ua=None, pool: WebDriverPool = None, limiter: RateLimiter = rate_limiter):
+        # Pooled producers borrow a driver on first use and give it back
+        # when session ends, instead of opening a browser session of their own.
+        self.pool = pool
+        self.limiter = limiter
+        self.pages = 0
+        self._webdriver = None
+        if not pool:
+            self._webdriver = connect_webdriver(address, timeout=timeout, custom_ua=custom_ua)
+
+    @property
+    def webdriver(self) -> webdriver.Remote:
+        if self._webdriver is None:
+            self._webdriver = self.pool.acquire()
+        return self._webdriver
 
     def _render_html(self):
         return self.webdriver.page_source
 
-    def get(self, url, wait_time: int = 0) -> HTMLResponse:
+    def _wait(self, condition: WaitCondition, timeout) -> bool:
+        try:
+            WebDriverWait(self.webdriver, timeout, poll_frequency=0.1).until(condition)
+            return True
+        except TimeoutException:
+            logger.warning(f"{condition.__class__.__name__} not met in {timeout} seconds. Continuing.")
+            return False
+
+    def _load(self, url, wait_time: int = 0, wait_until: WaitCondition = None) -> None:
+        # Without explicit condition wait up to `wait_time` until page stops rendering.
+        wait_until = wait_until or DOMQuiet()
+        # Browser does not expose status code, so only acquire without feedback.
+        self.limiter.acquire(url)
         self.webdriver.get(url)
+        self.pages += 1
         if wait_time:
-            WebDriverWait(self.webdriver, wait_time)
+            wait_until.before(self.webdriver)
+            self._wait(wait_until, wait_time)
 
+    def get(self, url, wait_time: int = 0, wait_until: WaitCondition = None) -> HTMLResponse:
+        self._load(url, wait_time=wait_time, wait_until=wait_until)
         return HTMLResponse(self._render_html())
 
-    def _scroll_page(self, scroll_by, wait_time: int = 0) -> None:
-        logger.info(f"Scrolled page by {scroll_by}, now waiting {wait_time} seconds.")
+    def _scroll(self, scroll_by, wait_time: int = 0, wait_until: WaitCondition = None) -> None:
+        if not wait_until:
+            logger.info(f"Scrolled page by {scroll_by}, now waiting {wait_time} seconds.")
+            self.webdriver.execute_script(f"window.scrollBy(0, {scroll_by})")
+            self.webdriver.execute_script(f"await new Promise(r => setTimeout(r, {wait_time}000));")
+            return
+
+        logger.info(f"Scrolled page by {scroll_by}, now waiting up to {wait_time} seconds for {wait_until.__class__.__name__}.")
+        wait_until.before(self.webdriver)
         self.webdriver.execute_script(f"window.scrollBy(0, {scroll_by})")
-        self.webdriver.execute_script(f"await new Promise(r => setTimeout(r, {wait_time}000));")
+        self._wait(wait_until, wait_time)
+
+    def _scroll_page(self, scroll_by, wait_time: int = 0, wait_until: WaitCondition = None) -> None:
+        self._scroll(scroll_by=scroll_by, wait_time=wait_time, wait_until=wait_until)
         return self._render_html()
 
+    def _render_new_elements(self, selector, index_attribute) -> list:
+        # Seen indices are kept in the browser, so only elements which were
+        # not returned before cross the wire, whatever the page length is.
+        javascript = """
+            const [selector, indexAttribute] = arguments;
+            window.__scraperSeen = window.__scraperSeen || new Set();
+            const elements = [];
+            for (const element of document.querySelectorAll(selector)) {
+                const index = element.getAttribute(indexAttribute);
+                if (!window.__scraperSeen.has(index)) {
+                    window.__scraperSeen.add(index);
+                    elements.push([index, element.outerHTML]);
+                }
+            }
+            return elements;
+        """
+        return self.webdriver.execute_script(javascript, selector, index_attribute)
+
     def _is_page_end(self):
         # Get the current page height
         javascript = """
@@ -76,12 +330,11 @@ class SeleniumProducer(HTMLProducer):
         return scroll_top + client_height >= scroll_height
 
     def get_while_scrolling(
-        self, url, wait_time, scroll_by, scroll_wait
+        self, url, wait_time, scroll_by, scroll_wait, wait_until: WaitCondition = None
     ) -> Generator[HTMLResponse, None, None]:
         # Initial page load and return html
         logger.info("Start scraping scroll down page.")
-        self.webdriver.get(url)
-        WebDriverWait(self.webdriver, wait_time)
+        self._load(url, wait_time=wait_time)
         rendered_html = self._render_html()
 
         # Return page after initial load
@@ -91,7 +344,9 @@ class SeleniumProducer(HTMLProducer):
         # Scroll down to the end of page and return a page
         # every time html changed.
         while True:
-            rendered_html_after_scroll = self._scroll_page(scroll_by=scroll_by, wait_time=scroll_wait)
+            rendered_html_after_scroll = self._scroll_page(
+                scroll_by=scroll_by, wait_time=scroll_wait, wait_until=wait_until
+            )
             if rendered_html_after_scroll != rendered_html:
                 rendered_html = rendered_html_after_scroll
                 yield HTMLResponse(rendered_html)
@@ -102,17 +357,65 @@ class SeleniumProducer(HTMLProducer):
                 break
 
 
-    def get_after_scroll(self, url, wait_time, scroll_by, scroll_wait) -> HTMLResponse:
+    def get_new_while_scrolling(
+        self, url, wait_time, scroll_by, scroll_wait, wait_until: WaitCondition = None,
+        selector="[data-index]", index_attribute="data-index",
+    ) -> Generator[HTMLResponse, None, None]:
+        """
+        Incremental version of `get_while_scrolling`. Instead of whole page
+        snapshot, every response contains only elements matching `selector`
+        which appeared since last response, identified by `index_attribute`.
+        """
+        logger.info("Start scraping new elements of scroll down page.")
+        self._load(url, wait_time=wait_time)
+
+        seen_indices = set()
+        while True:
+            new_elements = []
+            for index, html in self._render_new_elements(selector, index_attribute):
+                if index not in seen_indices:
+                    seen_indices.add(index)
+                    new_elements.append(html)
+
+            if new_elements:
+                yield HTMLResponse("<div>" + "".join(new_elements) + "</div>")
+                logger.info(f"Yielded response with {len(new_elements)} new elements.")
+
+            if self._is_page_end():
+                logger.info("Got to the end of page.")
+                break
+
+            self._scroll(scroll_by=scroll_by, wait_time=scroll_wait, wait_until=wait_until)
+
+    def get_after_scroll(self, url, wait_time, scroll_by, scroll_wait, wait_until: WaitCondition = None) -> HTMLResponse:
         self.get(url, wait_time=wait_time)
         while not self._is_page_end():
-            self._scroll_page(scroll_by=scroll_by, wait_time=scroll_wait)
+            self._scroll(scroll_by=scroll_by, wait_time=scroll_wait, wait_until=wait_until)
         
         return self._render_html()
 
+    def _release(self, broken: bool = False) -> None:
+        self.pool.release(self._webdriver, pages=self.pages, broken=broken)
+        self._webdriver = None
+        self.pages = 0
+
     def on_session_end(self):
+        if self.pool:
+            # Driver could be already given back by on_session_fail.
+            if self._webdriver is not None:
+                logger.info("Scraping session ended. Returning webdriver to pool.")
+                self._release()
+            return
+
         logger.info("Scraping session ended. Closing webdriver.")
         self.webdriver.quit()
 
     def on_session_fail(self):
+        if self.pool:
+            if self._webdriver is not None:
+                logger.error("Scraping session failed. Returning webdriver to pool.")
+                self._release(broken=not self.pool.is_healthy(self._webdriver))
+            return
+
         logger.error("Scraping session failed. Closing webdriver.")
         self.webdriver.quit()
@@ -1,19 +1,32 @@
 
 from typing import Any, List
-import requests
 
 from scraper.logger import logger
 
-from scraper.producer.html.html import HTMLProducer, HTMLResponse
+from scraper.producer.html.html import HTMLResponse
+from scraper.producer.html.rest import RESTProducer
+from scraper.producer.ratelimit import RateLimiter, rate_limiter
+from scraper.settings import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_TIMEOUT
 
 
-class SplashProducer(HTMLProducer):
-    def __init__(self, host: str, port: str) -> None:
+class SplashProducer(RESTProducer):
+    def __init__(
+        self,
+        host: str,
+        port: str,
+        pool_size: int = HTTP_POOL_SIZE,
+        timeout: float = HTTP_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        limiter: RateLimiter = rate_limiter,
+    ) -> None:
         self.host = host
         self.port = port
-        super().__init__()
+        super().__init__(pool_size=pool_size, timeout=timeout, retries=retries, limiter=limiter)
 
-    def get(self, url, wait_time:int = 1):
-        response = requests.get(f"http://{self.host}:{self.port}/render.html?url={url}&wait={wait_time}")
-        return HTMLResponse(response.text)
+    def _request_url(self, url, wait_time: int = None) -> str:
+        # Rate limiter is keyed by rendered page host, not by splash host.
+        return f"http://{self.host}:{self.port}/render.html?url={url}&wait={wait_time or 1}"
 
+    def get(self, url, wait_time:int = 1):
+        response = self._fetch(url, wait_time)
+        return HTMLResponse(response.content, url=url)
@@ -0,0 +1,102 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+from scraper.logger import logger
+from scraper.settings import RATE_LIMIT_BURST, RATE_LIMIT_HOSTS, RATE_LIMIT_RPS
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Tokens are refilled with `rate` per second
+    up to `burst`, every request takes one token.
+    """
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def slow_down(self, factor: float, min_rate: float, pause: float = 0) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(min_rate, self.rate * factor)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+
+    def speed_up(self, step: float) -> None:
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + step)
+
+
+class RateLimiter:
+    """
+    Per host rate limiter shared by producers.
+
+    Every host gets its own token bucket with `rate` requests per second
+    and `burst` size, unless overridden in `hosts`. Producers report
+    response status with `feedback`, 429 and 5xx responses halve the rate
+    of the host (and honour Retry-After), successful ones slowly bring
+    it back to the configured rate.
+    """
+
+    def __init__(
+        self,
+        rate: float = RATE_LIMIT_RPS,
+        burst: int = RATE_LIMIT_BURST,
+        hosts: Optional[Dict[str, Tuple[float, int]]] = None,
+        min_rate: float = 0.1,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.hosts = hosts or {}
+        self.min_rate = min_rate
+        self.buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlparse(url).netloc
+        with self._lock:
+            if host not in self.buckets:
+                rate, burst = self.hosts.get(host, (self.rate, self.burst))
+                self.buckets[host] = TokenBucket(rate=rate, burst=burst)
+            return self.buckets[host]
+
+    def acquire(self, url: str) -> None:
+        """Block until request to url's host is allowed."""
+        self.bucket(url).acquire()
+
+    def feedback(self, url: str, status_code: int, retry_after: Optional[str] = None) -> None:
+        bucket = self.bucket(url)
+        if status_code == 429 or status_code >= 500:
+            pause = float(retry_after) if retry_after and retry_after.isdigit() else 0
+            bucket.slow_down(factor=0.5, min_rate=self.min_rate, pause=pause)
+            logger.warning(
+                f"Got {status_code} from {urlparse(url).netloc}, slowing down to {bucket.rate:.2f} requests/s."
+            )
+        elif bucket.rate < bucket.max_rate:
+            bucket.speed_up(step=bucket.max_rate / 10)
+
+
+# Shared by all producers of the process, unless producer is given its own.
+rate_limiter = RateLimiter(hosts=RATE_LIMIT_HOSTS)
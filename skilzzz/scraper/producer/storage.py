@@ -1,14 +1,32 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import fnmatch
 import glob
+import hashlib
+import json
 import os
+from pathlib import Path
 import re
-from typing import List, Literal
+import threading
+from typing import Any, Dict, Generator, Iterable, List, Literal, Optional, Tuple
 
-from scraper.producer.base import Producer
-from scraper.settings import S3_BUCKET
+from botocore.exceptions import ClientError
+
+from scraper.logger import logger
+from scraper.producer.base import Producer, get_many
+from scraper.settings import (
+    MANIFEST_NAME,
+    MULTITHREAD_WORKERS,
+    PREFETCH_WINDOW,
+    S3_BUCKET,
+    STORAGE_CACHE_MAX_BYTES,
+    STORAGE_CACHE_ROOT,
+)
 from scraper.storage import S3Storage
-from scraper.storage import FileSystemStorage
+from scraper.storage import FileSystemStorage, decompress, is_not_found
+
+GLOB_MAGIC = re.compile(r"[*?[]")
 
 class BaseStorageProducer(Producer, ABC):
     
@@ -16,59 +34,259 @@ class BaseStorageProducer(Producer, ABC):
     def get(self, file) -> str:
         ...
 
+    @abstractmethod
+    def get_bytes(self, file) -> bytes:
+        ...
+
     @abstractmethod
     def glob(self, pattern) -> List[str]:
         ...
-    
+
+    def manifest(self, folder: str) -> List[Dict[str, Any]]:
+        """
+        Assets listed in manifest of session folder, read instead of globbing storage.
+        Folder of session killed before writing manifest is globbed, its assets have only key.
+        """
+        try:
+            manifest = json.loads(self.get(Path(folder) / MANIFEST_NAME))
+        except (FileNotFoundError, ClientError) as e:
+            # Only missing manifest means killed session, access or service errors are raised.
+            if not is_not_found(e):
+                raise
+            logger.warning(f"Cannot read manifest of {folder}, listing its files instead. {e}")
+            return [
+                {"key": file}
+                for file in self.glob(pattern=f"{folder}/*")
+                if Path(file).name != MANIFEST_NAME
+            ]
+
+        if not manifest.get("complete", True):
+            logger.warning(f"Manifest of {folder} is incomplete, its session failed.")
+        return manifest["assets"]
+
+    def get_many(
+        self, files: Iterable[str], window: int = PREFETCH_WINDOW, workers: int = MULTITHREAD_WORKERS
+    ) -> Generator[Tuple[str, Optional[bytes]], None, None]:
+        """
+        Download files concurrently and yield (file, content) in completion order.
+        At most `window` files are downloaded or waiting to be consumed at once.
+        Content of file that failed to download is None, so one failure does not
+        stop downloading the rest.
+        """
+        return get_many(self.get_bytes, files, window=window, workers=workers, name="prefetch")
+
+
+class DiskCache:
+    """
+    Thread-safe LRU cache of S3 objects in local directory.
+
+    Every object is kept as `<sha256 of key>.bin` with `.json` sidecar holding
+    its key, ETag and sha256 of content. Sidecars are written after content,
+    so cache survives restarts and interrupted writes without separate index.
+    Content not matching its hash is dropped, least recently used objects are
+    evicted when cache grows over `max_bytes`.
+    """
+
+    def __init__(self, root: str = STORAGE_CACHE_ROOT, max_bytes: int = STORAGE_CACHE_MAX_BYTES) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # key -> entry, ordered from least to most recently used
+        self.entries = OrderedDict()
+        sidecars = sorted(self.root.glob("*.json"), key=lambda sidecar: sidecar.stat().st_mtime)
+        for sidecar in sidecars:
+            entry = json.loads(sidecar.read_text())
+            self.entries[entry["key"]] = entry
+        self.size = sum(entry["size"] for entry in self.entries.values())
+        logger.info(f"Loaded storage cache {self.root} with {len(self.entries)} objects.")
+
+    def _path(self, key: str) -> Path:
+        return self.root / hashlib.sha256(key.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """ETag and content of cached object, None if not cached or corrupted."""
+        with self._lock:
+            if (entry := self.entries.get(key)) is None:
+                return None
+            self.entries.move_to_end(key)
+
+        path = self._path(key)
+        try:
+            content = path.with_suffix(".bin").read_bytes()
+            os.utime(path.with_suffix(".json"))
+        except FileNotFoundError:
+            # Evicted by another thread in the meantime.
+            return None
+
+        if hashlib.sha256(content).hexdigest() != entry["sha256"]:
+            logger.warning(f"Cached {key} does not match its hash, dropping it.")
+            self._drop(key)
+            return None
+        return entry["etag"], content
+
+    def put(self, key: str, etag: str, content: bytes) -> None:
+        path = self._path(key)
+        entry = {"key": key, "etag": etag, "sha256": hashlib.sha256(content).hexdigest(), "size": len(content)}
+
+        # Written to temporary files first, readers never see partial content.
+        for suffix, data in ((".bin", content), (".json", json.dumps(entry).encode())):
+            temporary = path.with_suffix(f"{suffix}.{threading.get_ident()}.tmp")
+            temporary.write_bytes(data)
+            os.replace(temporary, path.with_suffix(suffix))
+
+        evicted = []
+        with self._lock:
+            if (previous := self.entries.pop(key, None)):
+                self.size -= previous["size"]
+            self.entries[key] = entry
+            self.size += entry["size"]
+            while self.size > self.max_bytes and len(self.entries) > 1:
+                evicted_key, evicted_entry = self.entries.popitem(last=False)
+                self.size -= evicted_entry["size"]
+                evicted.append(evicted_key)
+
+        for evicted_key in evicted:
+            self._unlink(evicted_key)
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            if (entry := self.entries.pop(key, None)):
+                self.size -= entry["size"]
+        self._unlink(key)
+
+    def _unlink(self, key: str) -> None:
+        path = self._path(key)
+        path.with_suffix(".json").unlink(missing_ok=True)
+        path.with_suffix(".bin").unlink(missing_ok=True)
+
 
 class S3Producer(BaseStorageProducer, S3Storage):
+    """
+    Reads objects from S3 through optional local disk cache. Stored assets
+    are never rewritten under the same key, so cached object matching its
+    hash is served without any request. With `revalidate` it is served only
+    after conditional GetObject confirms its ETag, for keys that may change.
+    """
+
+    def __init__(self, bucket, cache: Optional[DiskCache] = None, revalidate: bool = False) -> None:
+        super().__init__(bucket=bucket)
+        self.cache = cache
+        self.revalidate = revalidate
 
     def get(self, file):
         return self.load(file=file)
 
-    def glob(self, pattern):
-        """Return a list of file paths in an S3 bucket that match the glob_pattern."""
-        paginator = self.s3.get_paginator('list_objects_v2')
+    def get_bytes(self, file) -> bytes:
+        return self.read(file=file)
+
+    def read(self, file) -> bytes:
+        """Read through local disk cache, cached object is revalidated with its ETag only if enabled."""
+        if self.cache is None:
+            return super().read(file)
+
+        key = str(file)
+        cached = self.cache.get(key)
+        if cached and not self.revalidate:
+            logger.debug(f"Serving {key} from storage cache.")
+            return decompress(cached[1])
+
+        params = {"Bucket": self.bucket, "Key": key}
+        if cached:
+            params["IfNoneMatch"] = cached[0]
 
-        # Extract the initial prefix from the glob pattern for efficient filtering
-        # by S3 (reduces the amount of data transferred).
-        prefix = pattern.split('*')[0][:-1]
+        try:
+            s3_object = self.s3.get_object(**params)
+        except ClientError as e:
+            if cached and e.response["Error"]["Code"] in ("304", "NotModified"):
+                logger.debug(f"Serving {key} from storage cache.")
+                return decompress(cached[1])
+            raise
 
-        all_filepaths = []
-        filtered_filepaths = []
+        content = s3_object["Body"].read()
+        self.cache.put(key, s3_object["ETag"], content)
+        return decompress(content)
 
+    def _list(self, prefix: str, delimiter: str = None) -> Tuple[List[str], List[str]]:
+        """Return common prefixes and keys listed under prefix."""
+        paginator = self.s3.get_paginator('list_objects_v2')
+        params = {"Bucket": self.bucket, "Prefix": prefix}
+        if delimiter:
+            params["Delimiter"] = delimiter
+
+        prefixes, keys = [], []
         # Pagination is used for large buckets that can't be listed in a single API call
-        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
-            # Checking if 'Contents' exists to avoid cases where the prefix has no matches
-            if 'Contents' in page:
-                for obj in page['Contents']:
-                    all_filepaths.append(obj['Key'])
+        for page in paginator.paginate(**params):
+            prefixes.extend(common_prefix['Prefix'] for common_prefix in page.get('CommonPrefixes', []))
+            keys.extend(obj['Key'] for obj in page.get('Contents', []))
+        return prefixes, keys
+
+    def glob(self, pattern):
+        """
+        Return a list of file paths in an S3 bucket that match the glob_pattern.
+
+        Pattern is resolved segment by segment like filesystem glob, every
+        wildcard segment (e.g. `year=*`) is listed with Delimiter='/' and
+        non-matching prefixes are pruned before going deeper. Prefixes of
+        one level are listed in parallel. Segments with `**` fall back to
+        listing everything below and matching whole keys.
+        """
+        segments = pattern.split('/')
+        prefixes = ['']
 
-        # Use fnmatch to filter the filepaths according to the glob_pattern
-        for filepath in all_filepaths:
-            if fnmatch.fnmatch(filepath, pattern):
-                filtered_filepaths.append(filepath)
+        with ThreadPoolExecutor(max_workers=MULTITHREAD_WORKERS, thread_name_prefix="glob") as executor:
+            for depth, segment in enumerate(segments):
+                if '**' in segment:
+                    listings = executor.map(lambda prefix: self._list(prefix)[1], prefixes)
+                    return sorted(key for keys in listings for key in keys if fnmatch.fnmatch(key, pattern))
 
-        return filtered_filepaths
+                if depth == len(segments) - 1:
+                    break
+
+                if not GLOB_MAGIC.search(segment):
+                    prefixes = [f"{prefix}{segment}/" for prefix in prefixes]
+                    continue
+
+                listings = executor.map(lambda prefix: self._list(prefix, delimiter='/')[0], prefixes)
+                prefixes = [
+                    prefix for listed in listings for prefix in listed
+                    if fnmatch.fnmatch(prefix.rstrip('/').rsplit('/', 1)[-1], segment)
+                ]
+                if not prefixes:
+                    return []
+
+            listings = executor.map(lambda prefix: self._list(prefix, delimiter='/')[1], prefixes)
+            return sorted(
+                key for keys in listings for key in keys
+                if fnmatch.fnmatch(key.rsplit('/', 1)[-1], segments[-1])
+            )
 
 class FileSystemProducer(BaseStorageProducer, FileSystemStorage):
     def get(self, key):
         return self.load(file=key)
 
+    def get_bytes(self, key) -> bytes:
+        return self.read(file=key)
+
     def glob(self, pattern: str) -> List[str]:
         return glob.glob(pattern)
 
 class StorageProducer(BaseStorageProducer):
-    def __init__(self, storage: Literal['fs', 's3']) -> None:
+    def __init__(self, storage: Literal['fs', 's3'], cache: bool = False, revalidate: bool = False) -> None:
         if storage == "fs":
             self.storage = FileSystemProducer()
         elif storage == "s3":
-            self.storage = S3Producer(bucket=S3_BUCKET)
+            # Local files are not cached, they are already on disk.
+            self.storage = S3Producer(bucket=S3_BUCKET, cache=DiskCache() if cache else None, revalidate=revalidate)
         else:
             raise ValueError(f"Unsupported storeage type {storage}.")
 
     def get(self, file) -> str:
         return self.storage.get(file)
 
+    def get_bytes(self, file) -> bytes:
+        return self.storage.get_bytes(file)
+
     def glob(self, pattern) -> str:
         return self.storage.glob(pattern)
\ No newline at end of file
@@ -1,17 +1,23 @@
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import datetime
 from abc import ABC, abstractmethod
 import json
+from pathlib import Path
+import posixpath
 import re
-from typing import Dict, Generator, Set, List
+import threading
+from typing import Any, Dict, Generator, Optional, Set, List, Type
 from itertools import takewhile
 
 from functools import partial
 
+from scraper.journal import Asset, Journal
 from scraper.logger import logger
+from scraper.manifest import SessionManifest
 from scraper.output import Output
+from scraper.partitioner import YMDTSPartitioner
 from scraper.settings import MULTITHREAD_WORKERS, SESSION_ID_REGEX, TIMESTAMP_FORMAT
 
 
@@ -20,63 +26,238 @@ class SessionMetadata:
     session_dt: datetime
     session_ts: datetime
 
+class SessionScheduler:
+    """
+    Runs child sessions of the whole session tree on one bounded worker pool.
+
+    Submitting blocks when all workers are busy and `max_queued` sessions are
+    already waiting, so `process()` generators are slowed down instead of
+    piling up work. `limits` caps number of sessions of given type in flight.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = MULTITHREAD_WORKERS,
+        max_queued: Optional[int] = None,
+        limits: Optional[Dict[Type["Session"], int]] = None,
+    ) -> None:
+        if max_queued is None:
+            max_queued = max_workers
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="session")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+        self._limits = {
+            session_type: threading.BoundedSemaphore(limit)
+            for session_type, limit in (limits or {}).items()
+        }
+        self._local = threading.local()
+
+    def submit(self, session: "Session") -> Future:
+        limit = self._limits.get(type(session))
+        if limit:
+            limit.acquire()
+
+        # Sessions yielded by a session already running on a worker are run
+        # inline. Parent waiting for children queued behind it could otherwise
+        # hold all of the workers and never finish.
+        if getattr(self._local, "is_worker", False):
+            future = Future()
+            try:
+                future.set_result(session.start())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                if limit:
+                    limit.release()
+            return future
+
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(self._run, session)
+        except:
+            self._slots.release()
+            if limit:
+                limit.release()
+            raise
+
+        future.add_done_callback(lambda _: self._release(limit))
+        return future
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=True)
+
+    def _run(self, session: "Session"):
+        self._local.is_worker = True
+        return session.start()
+
+    def _release(self, limit: Optional[threading.BoundedSemaphore]) -> None:
+        self._slots.release()
+        if limit:
+            limit.release()
+
+
+class SessionResults:
+    """
+    Thread-safe channel sessions of one tree push their stored assets into.
+
+    Assets are reduced to session folders as soon as they are pushed, the
+    folder is resolved once per asset prefix. Asset entries are collected
+    into session manifest, written by root session on completion.
+    """
+
+    def __init__(self, log_every: int = 100) -> None:
+        self.log_every = log_every
+        self._lock = threading.Lock()
+        self._prefixes: Dict[str, str] = {}
+        self._folders: Dict[str, Set[str]] = defaultdict(set)
+        self._counts: Dict[str, int] = defaultdict(int)
+        self.manifest = SessionManifest()
+
+    def push(self, collection: str, asset_path: str, entry: Optional[Dict[str, Any]] = None) -> None:
+        prefix = posixpath.dirname(asset_path)
+        with self._lock:
+            if (folder := self._prefixes.get(prefix)) is None:
+                # reduce granularity from asset to session folder
+                folder = self._prefixes[prefix] = re.findall(SESSION_ID_REGEX, asset_path)[0]
+            self._folders[collection].add(folder)
+            self._counts[collection] += 1
+            count = self._counts[collection]
+
+        self.manifest.add(folder, asset_path, entry)
+        if count % self.log_every == 0:
+            logger.info(f"Stored {count} assets of collection {collection} so far.")
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def session_folders(self) -> Dict[str, List[str]]:
+        with self._lock:
+            return {collection: list(folders) for collection, folders in self._folders.items()}
+
+
+class SessionGroup:
+    """Waits for child sessions in flight without keeping their futures around."""
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._pending = 0
+        self._error = None
+
+    def add(self, future: Future) -> None:
+        with self._condition:
+            self._pending += 1
+        future.add_done_callback(self._done)
+
+    def wait(self) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self._pending == 0)
+        if self._error:
+            raise self._error
+
+    def _done(self, future: Future) -> None:
+        with self._condition:
+            self._pending -= 1
+            if self._error is None and (error := future.exception()):
+                self._error = error
+            self._condition.notify_all()
+
+
 class Session(ABC):
-    def __init__(self, name: str, collection: str, producer, storer, settings, is_test=False):
+    def __init__(self, name: str, collection: str, producer, storer, settings, is_test=False, scheduler: SessionScheduler = None):
         self.name = name
         self.collection = collection
         self.producer = producer
         self.storer = storer
         self.settings = settings
         self.is_test = is_test
+        self.scheduler = scheduler
+        self.results = None
+        self.journal = None
         self.metadata = self.create_metadata()
 
+    def enable_journal(self) -> "Session":
+        """Record completed child sessions in journal, so interrupted session can be resumed."""
+        self.journal = self.create_journal()
+        return self
+
+    def resume(self, session_ts: str) -> "Session":
+        """Continue interrupted session, skipping child sessions completed in its journal."""
+        session_dt = datetime.strptime(session_ts, TIMESTAMP_FORMAT)
+        self.metadata = SessionMetadata(session_dt, session_ts)
+        self.journal = self.create_journal().load()
+        return self
+
     def start(self) -> None:
+        # Root session creates results channel, children inherit it and journal if enabled.
+        is_root = self.results is None
+        if is_root:
+            self.results = SessionResults()
+            if self.journal is not None:
+                # Outputs of journaled sessions has to be durable before journal is.
+                self.journal.on_flush(self.storer.checkpoint)
+                if self.journal.segment:
+                    self.storer.checkpoint(self.journal.segment)
+
+        if self.scheduler is None:
+            self.scheduler = SessionScheduler()
+
+        # Outputs of journaled session are stored together with its journal entry, so parts
+        # closed on journal flush never hold outputs of sessions missing in journal.
+        journaled = self.journal is not None and self.checkpoint_id() is not None
+
+        completed = False
         try:
-            with ThreadPoolExecutor(max_workers=MULTITHREAD_WORKERS) as executor:
-                # signal can be Output or Session
-                futures = []
-                assets = defaultdict(set)
-                for i, signal in enumerate(self.process()):
-
-                    # Test run, only first 10 outputs.
-                    if i >= 10 and self.is_test:
-                        logger.info("Ended session after 5 outputs.")
-                        break
-                    
-                    # Store if session yielded Output
-                    if isinstance(signal, Output):
-                        output = signal
-
-                        logger.info(f"Procesing output: {output}")
-                        output.session = self
-                        asset_path = self.storer.store(output=output)
-                        assets[self.collection].add(asset_path)
-                        
-                        self.storer.on_output_stored()
-                        self.producer.on_output_stored()
-
-                    # Run session, if new session was yielded
-                    if isinstance(signal, Session):
-                        new_session = signal
-                        # Inherit parent session metadata
-                        signal.metadata = self.metadata
-                        future = executor.submit(new_session.start)
-                        futures.append(future)
-
-                # Collect all results from child processes
-                results = [future.result() for future in futures]
-                combined_dict = defaultdict(set)
-                for d in results + [assets]:
-                    for key, value in d.items():
-                        combined_dict[key].update(value)
-
-                # The result is a dictionary with combined lists
-                assets = dict(combined_dict)
+            # signal can be Output or Session
+            children = SessionGroup()
+            deferred = []
+            for i, signal in enumerate(self.process()):
+
+                # Test run, only first 10 outputs.
+                if i >= 10 and self.is_test:
+                    logger.info("Ended session after 5 outputs.")
+                    break
+                
+                # Store if session yielded Output
+                if isinstance(signal, Output):
+                    output = signal
+
+                    logger.info(f"Procesing output: {output}")
+                    output.session = self
+                    if journaled:
+                        deferred.append(output)
+                    else:
+                        self.store(output)
+
+                # Run session, if new session was yielded
+                if isinstance(signal, Session):
+                    new_session = signal
+
+                    # Session completed before interruption, only report its assets.
+                    session_id = new_session.checkpoint_id()
+                    if session_id and self.journal and self.journal.is_completed(session_id):
+                        logger.info(f"Skipping session {session_id} completed in journal.")
+                        for asset in self.journal.assets(session_id):
+                            self.results.push(*asset)
+                        continue
+
+                    # Inherit parent session metadata, scheduler, results channel and journal
+                    new_session.metadata = self.metadata
+                    new_session.scheduler = self.scheduler
+                    new_session.results = self.results
+                    new_session.journal = self.journal
+                    children.add(self.scheduler.submit(new_session))
+
+            # Wait for child sessions, their assets are already in results channel.
+            children.wait()
 
             self.after_process() 
 
-            session_folders = self.get_session_folders_from_assets(assets)
-            return session_folders
+            if journaled:
+                self.journal.complete(self.checkpoint_id(), lambda: [self.store(output) for output in deferred])
+
+            completed = True
+            return self.results.session_folders()
 
         except Exception as e:
             self.storer.on_session_fail()
@@ -85,8 +266,25 @@ class Session(ABC):
             raise e
 
         finally:
+            if is_root:
+                self.scheduler.shutdown()
+                if self.journal:
+                    self.journal.flush()
             self.storer.on_session_end()
             self.producer.on_session_end()
+            # Manifest is written once stored files are closed, also for failed session.
+            if is_root:
+                self.results.manifest.save(self.storer.storage_type, complete=completed)
+
+    def store(self, output: Output) -> Asset:
+        asset_path = self.storer.store(output=output)
+        entry = {"size": output.size, "sha256": output.sha256, **output.metadata}
+        self.results.push(self.collection, asset_path, entry)
+
+        self.storer.on_output_stored()
+        self.producer.on_output_stored()
+        self.after_store(output, asset_path)
+        return (self.collection, asset_path, entry)
 
     def create_metadata(self) -> SessionMetadata:
         session_dt = datetime.now()
@@ -94,19 +292,22 @@ class Session(ABC):
 
         return SessionMetadata(session_dt, session_ts)
 
-    def get_session_folders_from_assets(self, assets: Dict[str, Set[str]]) -> Dict[str, List[str]]:
-        session_folders = {}
-        for collection, paths in assets.items():
-            # reduce granularity from asset to session folder
-            collection_folders = { re.findall(SESSION_ID_REGEX, path)[0] for path in paths }
-            session_folders[collection] = list(collection_folders)
+    def create_journal(self) -> Journal:
+        partition = YMDTSPartitioner(dt=self.metadata.session_dt).get()
+        root = Path(f"sources/{self.name}/{self.collection}/journal") / partition
+        return Journal(storage=self.storer.storage_type, root=root)
 
-        return session_folders
-            
+    def checkpoint_id(self) -> Optional[str]:
+        """Stable id of child session recorded in journal, sessions without it are never skipped."""
+        return None
 
     @abstractmethod
     def process(self) -> Generator[Output, None, None]:
         ...
 
     def after_process(self):
+        ...
+
+    def after_store(self, output: Output, asset_path: str):
+        """Called once output yielded by process is stored."""
         ...
\ No newline at end of file
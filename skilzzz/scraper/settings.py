@@ -3,11 +3,46 @@ import os
 # General
 TIMESTAMP_FORMAT = "%Y%m%d%H%M%S"
 MULTITHREAD_WORKERS = 8
+# Files or urls fetched ahead of consumer by get_many of producers
+PREFETCH_WINDOW = 32
+# Rate limiting, requests per second and burst per host
+RATE_LIMIT_RPS = float(os.environ.get('RATE_LIMIT_RPS') or 2)
+RATE_LIMIT_BURST = 4
+RATE_LIMIT_HOSTS = {}
+# HTTP producers
+HTTP_POOL_SIZE = MULTITHREAD_WORKERS
+HTTP_TIMEOUT = 30
+HTTP_RETRIES = 3
+HTTP_CACHE_ROOT = "cache/http"
+HTTP_CACHE_TTL = 24 * 60 * 60
+HTTP_CACHE_MAX_BYTES = 1024 ** 3
 # Selenium
 SELENIUM_ADDRESS = os.environ.get('SELENIUM_ADDRESS') or '0.0.0.0:4444'
+SELENIUM_POOL_SIZE = int(os.environ.get('SELENIUM_POOL_SIZE') or 4)
+SELENIUM_DRIVER_MAX_PAGES = 50
 
+# AWS
+AWS_MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS') or 50)
 # AWS S3
 S3_BUCKET = "skilzzz"
+S3_PART_SIZE = 8 * 1024 ** 2
+S3_UPLOAD_CONCURRENCY = 4
+# Local disk cache of objects read from S3 by StorageProducer
+STORAGE_CACHE_ROOT = os.environ.get('STORAGE_CACHE_ROOT') or "cache/storage"
+STORAGE_CACHE_MAX_BYTES = int(os.environ.get('STORAGE_CACHE_MAX_BYTES') or 5 * 1024 ** 3)
 
 # Storing settings:
+# Compression of stored outputs per output format, e.g. {"html": "gzip"}. One of {'gzip', 'zstd'}
+OUTPUT_COMPRESSION = {}
+# Writer thread storer, sessions are blocked when that many outputs wait for writing
+WRITER_QUEUE_SIZE = 1000
+# Parquet outputs
+PARQUET_ROW_GROUP_SIZE = 10_000
+PARQUET_COMPRESSION = "zstd"
+# Parse results cached by html content hash and parser fingerprint
+PARSE_CACHE_ROOT = "cache/parsed"
+# Journal of resumable sessions, completed sessions written per segment
+JOURNAL_FLUSH_EVERY = int(os.environ.get('JOURNAL_FLUSH_EVERY') or 50)
+# Written next to assets of every session partition
+MANIFEST_NAME = "manifest.json"
 SESSION_ID_REGEX = "sources/.*/year=[0-9]{4}/month=[0-9]{2}/day=[0-9]{2}/ts=[0-9]{14}"
\ No newline at end of file
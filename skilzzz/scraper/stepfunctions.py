@@ -1,9 +1,9 @@
 import json
 import os
-import boto3
 import traceback
       
 from scraper.logger import logger
+from scraper.storage import get_client
  
 def stepfunctions_callback_handler(func):
     """A wrapper for communicating with AWS Stepfunctions about output and state."""
@@ -11,7 +11,7 @@ def stepfunctions_callback_handler(func):
     def inner(*args, **kwargs):
         if (task_token := os.environ.get('AWS_STEPFUNCTIONS_TASK_TOKEN', None)):
             logger.info("Started task execution within AWS Step Functions.")
-            client = boto3.client('stepfunctions')
+            client = get_client('stepfunctions')
 
             try:
                 output: dict = func(*args, **kwargs)
@@ -1,13 +1,108 @@
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import os
 from pathlib import Path
-import tempfile
-from typing import Literal
+import threading
+from typing import BinaryIO, Literal
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 from scraper.logger import logger
-from scraper.settings import S3_BUCKET
+from scraper.settings import AWS_MAX_POOL_CONNECTIONS, S3_BUCKET, S3_PART_SIZE, S3_UPLOAD_CONCURRENCY
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(service: str = "s3"):
+    """
+    Process-wide boto3 client of given service. Clients are thread-safe,
+    so all storages share one client and its connection pool instead of
+    paying for client creation and TLS handshakes every time. Forked
+    processes (e.g. parser workers) create their own clients.
+    """
+    key = (service, os.getpid())
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = boto3.client(
+                service, config=Config(max_pool_connections=AWS_MAX_POOL_CONNECTIONS)
+            )
+        return _clients[key]
+
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class CompressedFile:
+    """Write-only file compressing written content on the fly into underlying file."""
+
+    def __init__(self, file: BinaryIO, compression: Literal['gzip', 'zstd']) -> None:
+        self.file = file
+        self.name = file.name
+        if compression == "gzip":
+            self.stream = gzip.GzipFile(fileobj=file, mode="wb")
+        elif compression == "zstd":
+            if zstandard is None:
+                raise ValueError("zstd compression requires zstandard package.")
+            self.stream = zstandard.ZstdCompressor().stream_writer(file, closefd=False)
+        else:
+            raise ValueError(f"Unsupported compression {compression}.")
+        self.finished = False
+
+    def write(self, content: bytes) -> None:
+        self.stream.write(content)
+
+    def finish(self) -> None:
+        """Write end of compressed stream, underlying file stays open."""
+        if not self.finished:
+            self.stream.close()
+            self.finished = True
+
+    def flush(self) -> None:
+        self.stream.flush()
+        self.file.flush()
+
+    def close(self) -> None:
+        self.finish()
+        self.file.close()
+
+
+def is_not_found(error: Exception) -> bool:
+    """True if reading file failed because it does not exist, in any storage."""
+    if isinstance(error, ClientError):
+        return error.response["Error"]["Code"] in ("404", "NoSuchKey")
+    return isinstance(error, FileNotFoundError)
+
+
+def compressed_writer(file: Path, handle: BinaryIO):
+    """Wrap opened handle into compressing writer if file suffix asks for compression."""
+    for compression, suffix in COMPRESSION_SUFFIXES.items():
+        if Path(file).suffix == suffix:
+            return CompressedFile(handle, compression)
+    return handle
+
+
+def decompress(content: bytes) -> bytes:
+    """Decompress gzip or zstd content detected by magic bytes, other content is returned as is."""
+    if content.startswith(GZIP_MAGIC):
+        return gzip.decompress(content)
+    if content.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("zstd compressed content requires zstandard package.")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    return content
+
 
 # IDEA: Make this context manager compatible?
 class BaseStorage(ABC):
@@ -25,6 +120,19 @@ class BaseStorage(ABC):
         logger.info(f"Loaded file {file} using {self.__class__.__name__} storage.")
         ...
 
+    @abstractmethod
+    def read(self, file: Path) -> bytes:
+        ...
+
+    @abstractmethod
+    def exists(self, file: Path) -> bool:
+        ...
+
+    @abstractmethod
+    def delete(self, file: Path):
+        logger.info(f"Deleted file {file} using {self.__class__.__name__} storage.")
+        ...
+
     @abstractmethod
     def write(self, file: Path, content: bytes):
         logger.info(f"Written file {file} using {self.__class__.__name__} storage.")
@@ -35,21 +143,35 @@ class BaseStorage(ABC):
         logger.info(f"Closed file {file} using {self.__class__.__name__} storage.")
         ...
 
+    def sync(self, file: Path):
+        """Push content written so far to storage, file stays open."""
+        self.opened[file].flush()
+
 
 class FileSystemStorage(BaseStorage):
 
     def open(self, file: Path):
         file.parent.mkdir(parents=True, exist_ok=True)
-        self.opened[file] = open(file, 'wb')
+        self.opened[file] = compressed_writer(file, open(file, 'wb'))
         super().open(file)
 
         
     def load(self, file: Path):
-        with open(file, "r") as f:
-            content =  f.read()
+        content = self.read(file).decode('utf-8')
         super().load(file)
         return content
 
+    def read(self, file: Path) -> bytes:
+        with open(file, "rb") as f:
+            return decompress(f.read())
+
+    def exists(self, file: Path) -> bool:
+        return Path(file).exists()
+
+    def delete(self, file: Path):
+        Path(file).unlink(missing_ok=True)
+        super().delete(file)
+
     def write(self, file: Path, content: bytes):
         self.opened[file].write(content)
         super().write(file, content)
@@ -59,31 +181,149 @@ class FileSystemStorage(BaseStorage):
         del self.opened[file]
         super().close(file)
 
+    def sync(self, file: Path):
+        handle = self.opened[file]
+        handle.flush()
+        raw = handle.file if isinstance(handle, CompressedFile) else handle
+        os.fsync(raw.fileno())
+
+
+class S3MultipartWriter:
+    """
+    Write-only file uploading its content to S3 while it is being written.
+
+    Content is buffered in memory and every `part_size` bytes are sent as
+    multipart upload part in background, at most `concurrency` parts are
+    in flight. Objects smaller than single part are sent with one PUT on
+    close. Upload is aborted when any part fails, aborted writer never
+    writes the object, its close raises.
+    """
+
+    def __init__(self, s3, bucket: str, key: str, part_size: int = S3_PART_SIZE, concurrency: int = S3_UPLOAD_CONCURRENCY) -> None:
+        self.s3 = s3
+        self.bucket = bucket
+        self.name = key
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.aborted = False
+        self.executor = None
+        self.futures = []
+        self._in_flight = threading.BoundedSemaphore(concurrency)
+
+    def write(self, content: bytes) -> None:
+        self._raise_if_aborted()
+        self.buffer += content
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[:self.part_size]))
+            del self.buffer[:self.part_size]
+
+    def flush(self) -> None:
+        ...
+
+    def _upload_part(self, body: bytes) -> None:
+        if self.upload_id is None:
+            upload = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.name)
+            self.upload_id = upload["UploadId"]
+            self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="s3-upload")
+
+        # Fail fast instead of buffering parts of upload that cannot complete.
+        for future in self.futures:
+            if future.done() and future.exception():
+                self.abort()
+                raise future.exception()
+
+        self._in_flight.acquire()
+        future = self.executor.submit(self._send_part, len(self.futures) + 1, body)
+        future.add_done_callback(lambda _: self._in_flight.release())
+        self.futures.append(future)
+
+    def _send_part(self, part_number: int, body: bytes) -> dict:
+        response = self.s3.upload_part(
+            Bucket=self.bucket, Key=self.name, UploadId=self.upload_id, PartNumber=part_number, Body=body
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def _raise_if_aborted(self) -> None:
+        if self.aborted:
+            raise IOError(f"Multipart upload of {self.name} was aborted.")
+
+    def close(self) -> None:
+        try:
+            self._raise_if_aborted()
+            if self.upload_id is None:
+                self.s3.put_object(Bucket=self.bucket, Key=self.name, Body=bytes(self.buffer))
+                return
+
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            parts = [future.result() for future in self.futures]
+            self.s3.complete_multipart_upload(
+                Bucket=self.bucket, Key=self.name, UploadId=self.upload_id, MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.buffer = bytearray()
+            if self.executor:
+                self.executor.shutdown(wait=True)
+
+    def abort(self) -> None:
+        if self.upload_id is None or self.aborted:
+            return
+        logger.error(f"Aborting multipart upload of {self.name}.")
+        # Upload id is kept, so close cannot mistake aborted upload for small object.
+        self.aborted = True
+        for future in self.futures:
+            future.cancel()
+        self.s3.abort_multipart_upload(Bucket=self.bucket, Key=self.name, UploadId=self.upload_id)
+
 
 class S3Storage(BaseStorage):
     def __init__(self, bucket) -> None:
-        self.s3 = boto3.client("s3")
+        self.s3 = get_client("s3")
         self.bucket = bucket
         super().__init__()
         
     def open(self, file: Path):
-        self.opened[file] = tempfile.NamedTemporaryFile()
+        writer = S3MultipartWriter(self.s3, self.bucket, str(file))
+        self.opened[file] = compressed_writer(file, writer)
         super().open(file)
 
     def load(self, file: Path):
-        s3_object = self.s3.get_object(Bucket=self.bucket, Key=str(file))
-        content = s3_object["Body"].read().decode('utf-8')
+        content = self.read(file).decode('utf-8')
         super().load(file)
         return content
 
+    def read(self, file: Path) -> bytes:
+        s3_object = self.s3.get_object(Bucket=self.bucket, Key=str(file))
+        return decompress(s3_object["Body"].read())
+
+    def exists(self, file: Path) -> bool:
+        try:
+            self.s3.head_object(Bucket=self.bucket, Key=str(file))
+            return True
+        except ClientError as e:
+            if is_not_found(e):
+                return False
+            raise
+
+    def delete(self, file: Path):
+        self.s3.delete_object(Bucket=self.bucket, Key=str(file))
+        super().delete(file)
+
     def write(self, file: Path, content: bytes):
         self.opened[file].write(content)
         super().write(file, content)
 
     def close(self, file: Path):
-        self.s3.upload_file(self.opened[file].name, self.bucket, str(file))
-        self.opened[file].close()
-        del self.opened[file]
+        # Completes upload, ending compressed stream first. Failed upload is not retried on next close.
+        try:
+            self.opened[file].close()
+        finally:
+            del self.opened[file]
         super().close(file)
 
         
@@ -104,8 +344,20 @@ class Storage(BaseStorage):
     def load(self, file: Path) -> str:
         return self.storage.load(file)
 
+    def read(self, file: Path) -> bytes:
+        return self.storage.read(file)
+
+    def exists(self, file: Path) -> bool:
+        return self.storage.exists(file)
+
+    def delete(self, file: Path) -> None:
+        return self.storage.delete(file)
+
     def write(self, file: Path, content: bytes) -> None:
         return self.storage.write(file, content)
 
     def close(self, file: Path) -> None:
-        return self.storage.close(file)
\ No newline at end of file
+        return self.storage.close(file)
+
+    def sync(self, file: Path) -> None:
+        return self.storage.sync(file)
\ No newline at end of file
@@ -1,17 +1,37 @@
 from abc import ABC, abstractmethod
+from collections import defaultdict
+import hashlib
 from pathlib import Path
-from typing import Literal
+import queue
+import threading
+from typing import Dict, Literal
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from scraper.logger import logger
 from scraper.partitioner import YMDTSPartitioner
 
-from scraper.output import Output 
-from scraper.storage import BaseStorage, Storage
+from scraper.output import Output, ParquetOutput
+from scraper.settings import (
+    OUTPUT_COMPRESSION,
+    PARQUET_COMPRESSION,
+    PARQUET_ROW_GROUP_SIZE,
+    WRITER_QUEUE_SIZE,
+)
+from scraper.storage import COMPRESSION_SUFFIXES, BaseStorage, Storage
 
 
 class Storer(ABC):
     """Responsible for implementing strategies of storing output"""
-    def __init__(self, storage: Literal['fs', 's3']):
+    def __init__(self, storage: Literal['fs', 's3'], compression: Dict[str, str] = None):
         self.storage_type = storage
         self.storage: BaseStorage = Storage(storage=storage)
+        # Output format -> compression, storage compresses files by their suffix.
+        self.compression = OUTPUT_COMPRESSION if compression is None else compression
 
     @abstractmethod
     def store(self, output: Output) -> Path:
@@ -26,17 +46,44 @@ class Storer(ABC):
     def on_output_stored(self):
         ...
 
+    def checkpoint(self, part: int):
+        """Make stored outputs durable, next outputs are stored as given part."""
+        ...
+
+    def close(self):
+        """Close all files opened by storer."""
+        for opened in list(self.storage.opened):
+            self.storage.close(opened)
+
+    def sync(self):
+        """Flush and fsync all files opened by storer, without closing them."""
+        for opened in list(self.storage.opened):
+            self.storage.sync(opened)
+
+    def serialize(self, output: Output) -> bytes:
+        """Serialize output, recording size and hash of content for session manifest."""
+        content = output.serialize()
+        output.size = len(content)
+        output.sha256 = hashlib.sha256(content).hexdigest()
+        return content
+
+    def get_key(self, output: Output) -> str:
+        return output.key
+
     def get_path(self, output: Output) -> Path:
         # This has nothing to do with storer anymore. This should be a output thing.
         partition = YMDTSPartitioner(dt=output.session.metadata.session_dt).get()
         session_root = Path(f"sources/{output.session.name}/{output.session.collection}/{output.format}")
-        return session_root / partition / output.key
+        key = self.get_key(output)
+        if (compression := self.compression.get(output.format)):
+            key += COMPRESSION_SUFFIXES[compression]
+        return session_root / partition / key
 
 class OverwriteStorer(Storer):
     """This storer will it create or overwrite file with given key."""
 
     def store(self, output: Output):
-        content = output.serialize()
+        content = self.serialize(output)
         output_path = self.get_path(output)
         
         self.storage.open(output_path)
@@ -47,24 +94,297 @@ class OverwriteStorer(Storer):
 
 
 class AppendStorer(Storer):
-    """This storer will append serialized output to asset with same key."""
+    """
+    This storer will append serialized output to asset with same key.
+    With `split_parts` checkpoint closes assets and next outputs are appended
+    to new part, so journaled outputs are durable also on s3 and resumed
+    session does not overwrite them. Otherwise checkpoint only flushes and
+    fsyncs opened assets.
+    """
+
+    def __init__(self, storage: Literal['fs', 's3'], compression: Dict[str, str] = None, split_parts: bool = False):
+        super().__init__(storage, compression=compression)
+        self.split_parts = split_parts
+        self.part = 0
+        self._lock = threading.RLock()
+
+    def get_key(self, output: Output) -> str:
+        # Outputs stored after checkpoint go to next part, closed files are never reopened.
+        key = Path(output.key)
+        if self.part:
+            return f"{key.stem}-{self.part:05}{key.suffix}"
+        return output.key
 
     def store(self, output: Output):
-        content = output.serialize()
-        output_path = self.get_path(output)
+        content = self.serialize(output)
 
-        if not output_path in self.storage.opened:
-            self.storage.open(output_path)
+        with self._lock:
+            output_path = self.get_path(output)
+            if not output_path in self.storage.opened:
+                self.storage.open(output_path)
 
-        self.storage.write(output_path, content)
+            self.storage.write(output_path, content)
         return str(output_path)
 
+    def checkpoint(self, part: int):
+        with self._lock:
+            if not self.split_parts:
+                self.sync()
+                return
+            self.close()
+            self.part = part
+
     def on_session_end(self):
-        for opened in self.storage.opened:
-            self.storage.close(opened)
+        self.close()
+
+
+class WriterThreadStorer(AppendStorer):
+    """
+    This storer will append serialized outputs to asset with same key from
+    single writer thread. Sessions only serialize output and put it into
+    bounded queue, `store` returns asset path without waiting for the write.
+    Writer thread owns all opened files and writes outputs queued for the
+    same asset at once. Write errors are raised by next `store` or `close`.
+    Writer is stopped on session end, next `store` starts it again.
+    """
+
+    def __init__(
+        self,
+        storage: Literal['fs', 's3'],
+        compression: Dict[str, str] = None,
+        max_queued: int = WRITER_QUEUE_SIZE,
+        split_parts: bool = False,
+    ):
+        super().__init__(storage, compression=compression, split_parts=split_parts)
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.thread = None
+        self.error = None
+
+    def store(self, output: Output):
+        content = self.serialize(output)
+
+        with self._lock:
+            self._raise_error()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="storer-writer", daemon=True)
+                self.thread.start()
+
+            output_path = self.get_path(output)
+            self.queue.put((output_path, content))
+        return str(output_path)
+
+    def close(self):
+        # Writer closes files once outputs queued before are written.
+        self._command(self._close_files)
+
+    def on_session_end(self):
+        try:
+            self.close()
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop writer thread once outputs queued before are written and raise its error."""
+        with self._lock:
+            if self.thread is not None:
+                self.queue.put((None, None))
+                self.thread.join()
+                self.thread = None
+            self._raise_error()
+
+    def sync(self):
+        self._command(self._sync_files)
+
+    def _command(self, command):
+        """Run command in writer thread after outputs queued before and wait for it."""
+        with self._lock:
+            if self.thread is not None:
+                done = threading.Event()
+                self.queue.put((None, (command, done)))
+                done.wait()
+            self._raise_error()
+
+    def _raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def _run(self):
+        while True:
+            # Take everything already queued, so outputs of one asset are written together.
+            items = [self.queue.get()]
+            while len(items) < self.queue.maxsize:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batches = defaultdict(list)
+            for output_path, content in items:
+                if output_path is not None:
+                    batches[output_path].append(content)
+                    continue
+
+                self._write(batches)
+                batches = defaultdict(list)
+                if content is None:
+                    return
+                command, done = content
+                command()
+                done.set()
+            self._write(batches)
+
+    def _write(self, batches):
+        try:
+            for output_path, contents in batches.items():
+                if not output_path in self.storage.opened:
+                    self.storage.open(output_path)
+                self.storage.write(output_path, b"".join(contents))
+        except Exception as e:
+            logger.error(f"Writer thread failed to write outputs. {e}")
+            self.error = e
+
+    def _close_files(self):
+        try:
+            super().close()
+        except Exception as e:
+            logger.error(f"Writer thread failed to close files. {e}")
+            self.error = e
+
+    def _sync_files(self):
+        try:
+            super().sync()
+        except Exception as e:
+            logger.error(f"Writer thread failed to sync files. {e}")
+            self.error = e
+
+
+class StorageSink:
+    """Write-only file object writing through storage, for writers expecting a file."""
+
+    def __init__(self, storage: BaseStorage, path: Path) -> None:
+        self.storage = storage
+        self.path = path
+        self.position = 0
+        self.closed = False
+
+    def write(self, content) -> int:
+        self.storage.write(self.path, bytes(content))
+        self.position += len(content)
+        return len(content)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        ...
+
+
+class ParquetStorer(AppendStorer):
+    """
+    This storer will buffer rows of ParquetOutput with same key and
+    write them to parquet file as row groups of `row_group_size` rows.
+    Rows are written only when row group fills or on close. Parquet is
+    readable only once its footer is written, so without `split_parts`
+    checkpoint does nothing and file is durable when session ends. With
+    `split_parts` every checkpoint closes file as part, as jsonl parts.
+    """
+
+    def __init__(
+        self,
+        storage: Literal['fs', 's3'],
+        row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+        parquet_compression: str = PARQUET_COMPRESSION,
+        split_parts: bool = False,
+    ):
+        if pq is None:
+            raise ValueError("ParquetStorer requires pyarrow package.")
+
+        # Parquet compresses column chunks itself, file is never compressed as whole.
+        super().__init__(storage, compression={}, split_parts=split_parts)
+        self.row_group_size = row_group_size
+        self.parquet_compression = parquet_compression
+        self.rows = defaultdict(list)
+        self.schemas = {}
+        self.writers = {}
+
+    def store(self, output: ParquetOutput):
+        row = output.serialize()
+
+        with self._lock:
+            output_path = self.get_path(output)
+            self.schemas[output_path] = output.schema
+            self.rows[output_path].append(row)
+            if len(self.rows[output_path]) >= self.row_group_size:
+                self._write_row_group(output_path)
+        return str(output_path)
+
+    def _write_row_group(self, output_path: Path):
+        rows = self.rows.pop(output_path, None)
+        if not rows:
+            return
+
+        schema = self.schemas[output_path]
+        if output_path not in self.writers:
+            self.storage.open(output_path)
+            self.writers[output_path] = pq.ParquetWriter(
+                StorageSink(self.storage, output_path), schema, compression=self.parquet_compression
+            )
+
+        table = pa.Table.from_pylist(rows, schema=schema)
+        self.writers[output_path].write_table(table, row_group_size=self.row_group_size)
+
+    def close(self):
+        # Buffered rows are written as last row group, before parquet footer.
+        with self._lock:
+            for output_path in list(self.rows):
+                self._write_row_group(output_path)
+            for output_path, writer in self.writers.items():
+                writer.close()
+            self.writers = {}
+            super().close()
+
+    def checkpoint(self, part: int):
+        if not self.split_parts:
+            return
+        with self._lock:
+            self.close()
+            self.part = part
+
+
+class MultiFormatStorer(Storer):
+    """This storer will store every output with storer assigned to output format."""
+
+    def __init__(self, storers: Dict[str, Storer]):
+        # Files are stored by storers of formats, own storage is not opening any.
+        super().__init__(next(iter(storers.values())).storage_type, compression={})
+        self.storers = storers
+
+    def store(self, output: Output):
+        return self.storers[output.format].store(output)
+
+    def on_session_end(self):
+        for storer in self.storers.values():
+            storer.on_session_end()
+
+    def on_session_fail(self):
+        for storer in self.storers.values():
+            storer.on_session_fail()
+
+    def on_output_stored(self):
+        for storer in self.storers.values():
+            storer.on_output_stored()
+
+    def checkpoint(self, part: int):
+        for storer in self.storers.values():
+            storer.checkpoint(part)
+
+    def close(self):
+        for storer in self.storers.values():
+            storer.close()
 
+    def sync(self):
+        for storer in self.storers.values():
+            storer.sync()
 
-# Idea for new kind of storer. Batch storer. 
-# Store n items in memory and write to a file in
-# batches instead of every file every time. 
 
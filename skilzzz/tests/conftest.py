@@ -0,0 +1,35 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+# Scripts and scraper package are imported from project folder, as in Dockerfiles.
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scraper.settings import S3_BUCKET
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """File system storage writes relative to working directory."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    moto = pytest.importorskip("moto")
+    import boto3
+
+    for name, value in {
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }.items():
+        monkeypatch.setenv(name, value)
+
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=S3_BUCKET)
+        yield client
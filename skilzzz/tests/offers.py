@@ -0,0 +1,80 @@
+import json
+import os
+from pathlib import Path
+import subprocess
+import sys
+from typing import Dict, List
+
+PROJECT = Path(__file__).parent.parent
+HTML_FOLDER = "sources/justjoinit/offers/html/year=2024/month=01/day=01/ts=20240101120000"
+PATTERN = "sources/justjoinit/offers/html/*/*/*/*/*.html"
+
+
+def offer_html(i: int, tech_stack: str = "Tech stack", job_description: str = "Job description") -> str:
+    """Offer page with the structure of justjoin.it offer, parsed the same by every parser version."""
+    return f"""<!DOCTYPE html>
+<html><head><title>x</title></head><body>
+<div id="top">
+ <div id="a">
+  <div id="b">
+   <div id="c"><h1 class="t">Data Engineer {i}</h1><span>x</span><section><div>
+          <div><span><span>10 000</span> - <span>15 {i:03}</span> PLN</span><span>Net per month - B2B</span></div>
+          <div><span><span>9 000</span> EUR</span><span>Gross per month - Permanent</span></div>
+        </div></section>
+    <div><svg data-testid="ApartmentRoundedIcon"></svg> ACME {i} </div>
+    <div><svg data-testid="PlaceOutlinedIcon"></svg> Warsaw </div>
+   </div>
+  </div>
+ </div>
+ <div id="info">
+   <div><div>i</div><div><div>Type of work</div><div> Full-time </div></div></div>
+   <div><div>i</div><div><div>Experience</div><div>Senior</div></div></div>
+   <div><div>i</div><div><div>Employment Type</div><div>B2B</div></div></div>
+   <div><div>i</div><div><div>Operating mode</div><div>Remote</div></div></div>
+ </div>
+ <div>
+   <div><h3>{tech_stack}</h3>
+     <ul>
+       <li><div><h6>Python</h6><span>advanced</span></div></li>
+       <li><div><h6> SQL </h6><span>regular</span></div></li>
+     </ul>
+   </div>
+ </div>
+ <div>
+   <div><h3>{job_description}</h3></div>
+   <div><p>We do <b>data</b> things {i}.</p><ul><li>one</li><li>two &amp; three</li></ul></div>
+ </div>
+</div>
+</body></html>"""
+
+
+def write_offers(count: int, folder: str = HTML_FOLDER) -> List[Path]:
+    paths = []
+    for i in range(count):
+        path = Path(folder) / f"{i:05}-offer-{i}.html"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(offer_html(i))
+        paths.append(path)
+    return paths
+
+
+def run_parser(*args: str, env: Dict[str, str] = None, prelude: str = "") -> subprocess.CompletedProcess:
+    """Run parser CLI in working directory, `prelude` is executed after parser module is imported."""
+    script = "\n".join([
+        "import sys",
+        f"sys.path.insert(0, {str(PROJECT)!r})",
+        "import justjoinit__parser as parser",
+        prelude,
+        "parser.main(sys.argv[1:])",
+    ])
+    return subprocess.run(
+        [sys.executable, "-c", script, "--read", "fs", "--write", "fs", *args],
+        capture_output=True, text=True, env={**os.environ, **(env or {})},
+    )
+
+
+def read_jsonl(pattern: str = "sources/justjoinit/offers/jsonl/**/*.jsonl") -> Dict[str, List[dict]]:
+    return {
+        str(path): [json.loads(line) for line in path.read_text().splitlines()]
+        for path in sorted(Path().glob(pattern))
+    }
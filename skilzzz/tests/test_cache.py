@@ -0,0 +1,42 @@
+from scraper.producer.html.cache import CachedProducer
+
+
+class Response:
+    def __init__(self, status_code: int, content: bytes = b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {"ETag": "etag"}
+
+
+class FakeProducer:
+    pool_size = 1
+
+    def __init__(self, content: bytes):
+        self.content = content
+        self.requests = []
+
+    def _fetch(self, url, wait_time, headers=None):
+        self.requests.append(headers)
+        return Response(200, self.content)
+
+
+def test_hit_returns_bytes_as_stored():
+    content = "<html><body>Zażółć gęślą jaźń</body></html>".encode("cp1250")
+    producer = FakeProducer(content)
+    cache = CachedProducer(producer, root="cache", ttl=60)
+
+    miss = cache.get("https://example.com/offer")
+    hit = cache.get("https://example.com/offer")
+
+    assert len(producer.requests) == 1
+    assert hit.raw == miss.raw == content
+
+
+def test_missing_cached_file_is_fetched_again():
+    producer = FakeProducer(b"<html></html>")
+    cache = CachedProducer(producer, root="cache", ttl=60)
+    cache.get("https://example.com/offer")
+    cache.storage.delete(cache._key("https://example.com/offer"))
+
+    assert cache.get("https://example.com/offer").raw == b"<html></html>"
+    assert len(producer.requests) == 2
@@ -0,0 +1,63 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from offers import PATTERN, read_jsonl, run_parser, write_offers
+
+# Process is killed without flushing journal or storer, once 25 files are parsed.
+# Sessions finish slowly, so journal is flushed while others are still running.
+KILL_AFTER = """
+import os, threading, time
+parser.JustjoinintOfferParser.after_process = lambda self: time.sleep(0.05)
+parsed, lock = [0], threading.Lock()
+parse_files = parser.parse_files
+def killing_parse_files(*args, **kwargs):
+    with lock:
+        parsed[0] += 1
+        if parsed[0] > 25:
+            os._exit(1)
+    return parse_files(*args, **kwargs)
+parser.parse_files = killing_parse_files
+"""
+
+
+def test_resumed_session_stores_every_offer_once():
+    write_offers(40)
+    env = {"JOURNAL_FLUSH_EVERY": "7"}
+
+    interrupted = run_parser("--pattern", PATTERN, "--journal", env=env, prelude=KILL_AFTER)
+    assert interrupted.returncode == 1
+    journal, = Path().glob("sources/justjoinit/offers/journal/*/*/*/ts=*")
+    assert list(journal.glob("journal-*.jsonl"))
+
+    resumed = run_parser("--pattern", PATTERN, "--resume", journal.name.removeprefix("ts="), env=env)
+    assert resumed.returncode == 0, resumed.stderr
+
+    parts = read_jsonl()
+    offer_ids = [record["offer_id"] for records in parts.values() for record in records]
+    assert len(offer_ids) == len(set(offer_ids)) == 40
+
+    manifest, = Path().glob("sources/justjoinit/offers/jsonl/**/manifest.json")
+    assets = json.loads(manifest.read_text())["assets"]
+    assert {asset["key"]: asset["records"] for asset in assets} == {path: len(records) for path, records in parts.items()}
+
+
+def test_resumed_session_stores_every_parquet_row_once():
+    pq = pytest.importorskip("pyarrow.parquet")
+    write_offers(40)
+    env = {"JOURNAL_FLUSH_EVERY": "7"}
+
+    run_parser("--pattern", PATTERN, "--parquet", "--journal", env=env, prelude=KILL_AFTER)
+    journal, = Path().glob("sources/justjoinit/offers/journal/*/*/*/ts=*")
+    resumed = run_parser("--pattern", PATTERN, "--parquet", "--resume", journal.name.removeprefix("ts="), env=env)
+    assert resumed.returncode == 0, resumed.stderr
+
+    parts = {str(path): pq.read_table(path) for path in sorted(Path().glob("sources/justjoinit/offers/parquet/**/*.parquet"))}
+    assert len(parts) > 1
+    offer_ids = [offer_id for table in parts.values() for offer_id in table.column("offer_id").to_pylist()]
+    assert len(offer_ids) == len(set(offer_ids)) == 40
+
+    manifest, = Path().glob("sources/justjoinit/offers/parquet/**/manifest.json")
+    assets = json.loads(manifest.read_text())["assets"]
+    assert {asset["key"]: asset["records"] for asset in assets} == {path: table.num_rows for path, table in parts.items()}
@@ -0,0 +1,35 @@
+from botocore.exceptions import ClientError
+import pytest
+
+from scraper.manifest import SessionManifest
+from scraper.producer.storage import StorageProducer
+from scraper.settings import S3_BUCKET
+
+FOLDER = "sources/justjoinit/offers/html/year=2024/month=01/day=01/ts=20240101120000"
+
+
+def test_manifest_lists_assets_of_saved_manifest():
+    manifest = SessionManifest()
+    manifest.add(FOLDER, f"{FOLDER}/00000-a.html", {"offer_id": "a"})
+    manifest.save("fs", complete=False)
+
+    assets = StorageProducer(storage="fs").manifest(FOLDER)
+    assert [(asset["key"], asset["offer_id"]) for asset in assets] == [(f"{FOLDER}/00000-a.html", "a")]
+
+
+def test_folder_without_manifest_is_listed(s3):
+    s3.put_object(Bucket=S3_BUCKET, Key=f"{FOLDER}/00000-a.html", Body=b"<html></html>")
+
+    assert StorageProducer(storage="s3").manifest(FOLDER) == [{"key": f"{FOLDER}/00000-a.html"}]
+
+
+def test_manifest_read_errors_are_raised(s3, monkeypatch):
+    producer = StorageProducer(storage="s3")
+    denied = ClientError({"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "GetObject")
+
+    def get(file):
+        raise denied
+    monkeypatch.setattr(producer, "get", get)
+
+    with pytest.raises(ClientError):
+        producer.manifest(FOLDER)
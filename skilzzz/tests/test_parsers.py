@@ -0,0 +1,39 @@
+from bs4 import BeautifulSoup
+import pytest
+
+from offers import offer_html
+from scraper.parsers.exceptions import InvalidHTMLDocument
+from scraper.parsers.justjoinit import parsers
+
+HEADINGS = {
+    "plain": ("Tech stack", "Job description"),
+    "split": ("<span>Tech</span> stack", "Job <b>Description</b>"),
+    "split_word": ("Te<i>ch</i> st<span>ack</span>", "<span>Job</span><span> </span>description"),
+    "whitespace": ("\n  TECH stack ", " Job description\n"),
+    "script": ("Tech stack<script>track('heading')</script>", "<style>h3 {}</style>Job description"),
+}
+
+
+def parse_v1(page: str) -> dict:
+    return parsers["v1"](BeautifulSoup(page, "lxml"))
+
+
+@pytest.mark.parametrize("variant", HEADINGS)
+def test_v2_finds_headings_as_v1(variant):
+    tech_stack, job_description = HEADINGS[variant]
+    page = offer_html(1, tech_stack=tech_stack, job_description=job_description)
+
+    offer = parsers["v2"](page)
+    assert offer == parse_v1(page)
+    assert [skill["skill_name"] for skill in offer["skills"]] == ["Python", "SQL"]
+    assert "data things 1" in offer["description"]
+
+
+def test_v2_rejects_heading_not_matched_by_v1():
+    # v1 compares stripped text, whitespace inside heading is not normalized.
+    page = offer_html(1, tech_stack="Tech  stack")
+
+    with pytest.raises(InvalidHTMLDocument):
+        parsers["v2"](page)
+    with pytest.raises(AttributeError):
+        parse_v1(page)
@@ -0,0 +1,45 @@
+from scraper.producer.html.rest import RESTProducer
+from scraper.producer.ratelimit import RateLimiter
+
+
+class Response:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, url: str):
+        self.content = f"<html>{url}</html>".encode()
+
+
+class FakeSession:
+    def get(self, url, headers=None, timeout=None):
+        if url.endswith("/3"):
+            raise ConnectionError("connection reset")
+        return Response(url)
+
+
+def test_get_many_yields_failed_url_and_keeps_fetching():
+    producer = RESTProducer(pool_size=2, limiter=RateLimiter(rate=1000, burst=1000))
+    producer.session = FakeSession()
+    urls = [f"https://example.com/{i}" for i in range(10)]
+
+    responses = dict(producer.get_many(urls, window=4))
+
+    assert set(responses) == set(urls)
+    assert responses["https://example.com/3"] is None
+    assert responses["https://example.com/5"].raw == b"<html>https://example.com/5</html>"
+
+
+def test_get_many_requests_at_most_window_urls_ahead():
+    producer = RESTProducer(pool_size=2, limiter=RateLimiter(rate=1000, burst=1000))
+    producer.session = FakeSession()
+    taken = []
+
+    def urls():
+        for i in range(100):
+            taken.append(i)
+            yield f"https://example.com/{i}"
+
+    responses = producer.get_many(urls(), window=4)
+    next(responses)
+    assert len(taken) <= 5
+    responses.close()
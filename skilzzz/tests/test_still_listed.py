@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from offers import HTML_FOLDER, PATTERN, read_jsonl, run_parser, write_offers
+
+LISTED_AT = "20240102120000"
+LISTED_FOLDER = f"sources/justjoinit/offers/html/year=2024/month=01/day=02/ts={LISTED_AT}"
+STILL_LISTED = f"sources/justjoinit/offerlist/jsonl/year=2024/month=01/day=02/ts={LISTED_AT}/justjoinit-still-listed-{LISTED_AT}.jsonl"
+
+
+@pytest.fixture
+def sessions():
+    """Offers 0-2 scraped in first session, second session scraped offer 3 and found offer 1 unchanged."""
+    first = write_offers(3)
+    new = Path(LISTED_FOLDER) / "00000-offer-3.html"
+    new.parent.mkdir(parents=True)
+    new.write_text(first[0].read_text().replace(" 0", " 3"))
+
+    Path(STILL_LISTED).parent.mkdir(parents=True)
+    Path(STILL_LISTED).write_text(json.dumps({
+        "offer_id": "offer-1",
+        "offer_index": 7,
+        "listed_at": LISTED_AT,
+        "key": str(first[1]),
+        "last_scraped": "20240101120000",
+        "first_seen": "20240101120000",
+        "last_seen": "20240101120000",
+    }) + "\n")
+
+
+def listed_offers(records):
+    return sorted((record["offer_id"], record["offer_index"]) for record in records)
+
+
+def test_parses_still_listed_offers_of_session(sessions):
+    parsed = run_parser("--pattern", PATTERN)
+    assert parsed.returncode == 0, parsed.stderr
+
+    offers = read_jsonl()
+    first, = read_jsonl(f"sources/justjoinit/offers/jsonl/**/{Path(HTML_FOLDER).name}/*.jsonl").values()
+    listed, = read_jsonl(f"sources/justjoinit/offers/jsonl/**/ts={LISTED_AT}/*.jsonl").values()
+    assert len(offers) == 2
+    assert listed_offers(first) == [("offer-0", "00000"), ("offer-1", "00001"), ("offer-2", "00002")]
+    assert listed_offers(listed) == [("offer-1", "00007"), ("offer-3", "00000")]
+    assert {record["listed_at"] for record in listed} == {LISTED_AT}
+
+    still_listed, = [record for record in listed if record["offer_id"] == "offer-1"]
+    assert still_listed["title"] == next(record for record in first if record["offer_id"] == "offer-1")["title"]
+
+
+def test_parses_still_listed_offers_of_manifest_folder(sessions):
+    parsed = run_parser("--manifest", LISTED_FOLDER, "--parse-cache")
+    assert parsed.returncode == 0, parsed.stderr
+
+    listed, = read_jsonl().values()
+    assert listed_offers(listed) == [("offer-1", "00007"), ("offer-3", "00000")]
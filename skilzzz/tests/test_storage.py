@@ -0,0 +1,49 @@
+import pytest
+
+from scraper.settings import S3_BUCKET
+from scraper.storage import S3MultipartWriter
+
+
+class FailingPartClient:
+    """S3 client failing upload of given part."""
+
+    def __init__(self, s3, failing_part: int):
+        self.s3 = s3
+        self.failing_part = failing_part
+
+    def upload_part(self, **kwargs):
+        if kwargs["PartNumber"] == self.failing_part:
+            raise ConnectionError("part upload failed")
+        return self.s3.upload_part(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.s3, name)
+
+
+def test_aborted_multipart_upload_writes_no_object(s3):
+    writer = S3MultipartWriter(FailingPartClient(s3, failing_part=2), S3_BUCKET, "out.jsonl", part_size=5, concurrency=1)
+
+    with pytest.raises((ConnectionError, IOError)):
+        for chunk in (b"01234", b"56789", b"01234", b"56", b"0123456"):
+            writer.write(chunk)
+            # Let background part upload finish, so its failure is seen on next part.
+            for future in writer.futures:
+                future.exception()
+
+    with pytest.raises(IOError):
+        writer.close()
+
+    assert "Contents" not in s3.list_objects_v2(Bucket=S3_BUCKET)
+    assert not s3.list_multipart_uploads(Bucket=S3_BUCKET).get("Uploads")
+
+
+def test_close_raises_when_part_upload_fails_on_close(s3):
+    writer = S3MultipartWriter(FailingPartClient(s3, failing_part=2), S3_BUCKET, "out.jsonl", part_size=5, concurrency=1)
+    writer.write(b"012345678")
+
+    with pytest.raises(ConnectionError):
+        writer.close()
+    with pytest.raises(IOError):
+        writer.close()
+
+    assert "Contents" not in s3.list_objects_v2(Bucket=S3_BUCKET)
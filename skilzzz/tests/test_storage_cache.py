@@ -0,0 +1,56 @@
+from scraper.producer.storage import DiskCache, S3Producer
+from scraper.settings import S3_BUCKET
+
+
+class CountingClient:
+    """S3 client recording parameters of every GetObject."""
+
+    def __init__(self, s3):
+        self.s3 = s3
+        self.gets = []
+
+    def get_object(self, **kwargs):
+        self.gets.append(kwargs)
+        return self.s3.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.s3, name)
+
+
+def producer(s3, revalidate: bool = False) -> S3Producer:
+    producer = S3Producer(bucket=S3_BUCKET, cache=DiskCache(root="cache"), revalidate=revalidate)
+    producer.s3 = CountingClient(s3)
+    return producer
+
+
+def test_cached_object_is_served_without_request(s3):
+    s3.put_object(Bucket=S3_BUCKET, Key="offer.html", Body=b"<html></html>")
+    producer(s3).read("offer.html")
+
+    cached = producer(s3)
+    assert cached.read("offer.html") == b"<html></html>"
+    assert cached.s3.gets == []
+
+
+def test_cached_object_is_revalidated_if_enabled(s3):
+    s3.put_object(Bucket=S3_BUCKET, Key="offer.html", Body=b"<html></html>")
+    producer(s3).read("offer.html")
+
+    revalidated = producer(s3, revalidate=True)
+    assert revalidated.read("offer.html") == b"<html></html>"
+    get, = revalidated.s3.gets
+    assert "IfNoneMatch" in get
+
+    s3.put_object(Bucket=S3_BUCKET, Key="offer.html", Body=b"<html>changed</html>")
+    assert revalidated.read("offer.html") == b"<html>changed</html>"
+
+
+def test_corrupted_cached_object_is_fetched_again(s3):
+    s3.put_object(Bucket=S3_BUCKET, Key="offer.html", Body=b"<html></html>")
+    first = producer(s3)
+    first.read("offer.html")
+    first.cache._path("offer.html").with_suffix(".bin").write_bytes(b"<html>corrupted</html>")
+
+    cached = producer(s3)
+    assert cached.read("offer.html") == b"<html></html>"
+    assert len(cached.s3.gets) == 1
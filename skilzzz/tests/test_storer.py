@@ -0,0 +1,50 @@
+from datetime import datetime
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from scraper.output import DictOutput
+from scraper.session import SessionMetadata
+from scraper.storer import WriterThreadStorer
+
+SESSION = SimpleNamespace(
+    name="test",
+    collection="offers",
+    metadata=SessionMetadata(datetime(2024, 1, 1, 12), "20240101120000"),
+)
+
+
+def output(i: int) -> DictOutput:
+    output = DictOutput(key="offers.jsonl", content={"i": i})
+    output.session = SESSION
+    return output
+
+
+def test_session_end_writes_outputs_and_stops_writer():
+    storer = WriterThreadStorer(storage="fs", max_queued=4)
+    path = storer.store(output(0))
+    thread = storer.thread
+    for i in range(1, 10):
+        storer.store(output(i))
+
+    storer.on_session_end()
+
+    assert not thread.is_alive() and storer.thread is None
+    assert [json.loads(line)["i"] for line in Path(path).read_text().splitlines()] == list(range(10))
+
+
+def test_session_end_raises_writer_error():
+    storer = WriterThreadStorer(storage="fs")
+
+    def failing_write(file, content):
+        raise OSError("disk full")
+
+    storer.storage.write = failing_write
+    storer.store(output(0))
+    thread = storer.thread
+
+    with pytest.raises(OSError, match="disk full"):
+        storer.on_session_end()
+    assert not thread.is_alive() and storer.thread is None